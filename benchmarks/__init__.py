@@ -0,0 +1,6 @@
+'''
+Бенчмарки горячих путей обучения и инференса
+
+    python -m benchmarks.run --sizes 4000 100000 1000000
+    python -m benchmarks.compare benchmarks/results/<base>.json benchmarks/results/<head>.json
+'''
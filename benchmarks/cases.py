@@ -0,0 +1,476 @@
+'''
+Набор бенчмарков
+
+Каждый бенчмарк получает Dataset и возвращает пару (setup, run): setup готовит
+состояние перед каждым повтором и не замеряется (None - подготовка не нужна),
+замеряется только run. Третьим элементом бенчмарк может вернуть score - функцию от
+результата последнего run, ее значение (например, метрика модели) сохраняется
+рядом со временем. max_rows ограничивает размеры, на которых бенчмарк имеет
+смысл (точные SVM и KNN квадратичны по кол-ву строк)
+'''
+
+import os
+
+import numpy as np
+import pandas as pd
+import phik  # noqa: F401
+import shap
+
+from sklearn.base import clone
+from sklearn.inspection import permutation_importance
+from sklearn.metrics import get_scorer
+
+from hr_analytics.cleaning import clean_csv
+from hr_analytics.correlation import IncrementalPhiK, phik_matrix
+from hr_analytics.data import (
+    FEATURES_SCHEMA,
+    cols_names_cleaner,
+    convert_columns_dtype,
+    find_implicit_duplicates,
+    text_vals_cleaner,
+    text_vals_to_nan
+)
+from hr_analytics.explain import explain, explain_model
+from hr_analytics.importance import (
+    get_feature_groups,
+    permutation_importance as permutation_importance_grouped,
+    pipeline_permutation_importance
+)
+from hr_analytics.modeling import (
+    RANDOM_STATE,
+    build_exact_svm_model,
+    build_kernel_approx_model,
+    build_pipeline,
+    construct_param_grid_sklearn,
+    get_rbf_params,
+    smape_score,
+    smape_scorer
+)
+from hr_analytics.profiling import profile_frame
+from hr_analytics.search import get_model_name
+from hr_analytics.segments import segment_report
+
+from benchmarks.datasets import FEATURES_DTYPE_MAP
+
+# Текстовые столбцы, читаемые из Parquet как словарные
+CATEGORY_COLUMNS = ['dept', 'level', 'workload', 'last_year_promo', 'last_year_violations']
+
+BENCHMARKS = {}
+
+# Фоновая выборка SHAP как в ноутбуке; объясняемых строк меньше, т.к. каждая
+# строка PermutationExplainer стоит тысячи вызовов predict точной SVR
+SHAP_BACKGROUND = 150
+SHAP_ROWS = 10
+
+
+def benchmark(name, max_rows=None):
+    def decorator(func):
+        BENCHMARKS[name] = {'func': func, 'max_rows': max_rows}
+        return func
+
+    return decorator
+
+
+@benchmark('load_data')
+def bench_load_data(ds):
+    ds.csv_path
+
+    return None, ds.load
+
+
+@benchmark('load_data.schema')
+def bench_load_data_schema(ds):
+    ds.csv_path
+
+    return None, lambda: ds.load(schema=FEATURES_SCHEMA)
+
+
+@benchmark('load_data.schema.pyarrow')
+def bench_load_data_schema_pyarrow(ds):
+    ds.csv_path
+
+    return None, lambda: ds.load(schema=FEATURES_SCHEMA, engine='pyarrow')
+
+
+@benchmark('load_data.parquet_cache')
+def bench_load_data_cached(ds):
+    # Первое чтение создает кэш Parquet и не замеряется
+    ds.load_cached()
+
+    return None, lambda: ds.load_cached(categories=CATEGORY_COLUMNS)
+
+
+@benchmark('load_data.parquet_cache.projection')
+def bench_load_data_projection(ds):
+    ds.load_cached()
+
+    return None, lambda: ds.load_cached(columns=['dept', 'level', 'salary'], categories=['dept', 'level'])
+
+
+@benchmark('clean_csv')
+def bench_clean_csv(ds):
+    ds.csv_path
+
+    return None, lambda: clean_csv(ds.csv_path, os.path.join(ds.workdir, 'cleaned.parquet'))
+
+
+@benchmark('text_vals_to_nan')
+def bench_text_vals_to_nan(ds):
+    return lambda: ds.raw('quit'), text_vals_to_nan
+
+
+@benchmark('text_vals_cleaner')
+def bench_text_vals_cleaner(ds):
+    dept = ds.raw_quit['dept']
+
+    return None, lambda: text_vals_cleaner(dept)
+
+
+@benchmark('text_vals_cleaner.category')
+def bench_text_vals_cleaner_category(ds):
+    dept = ds.raw_quit['dept'].astype('category')
+
+    return None, lambda: text_vals_cleaner(dept)
+
+
+@benchmark('find_implicit_duplicates')
+def bench_find_implicit_duplicates(ds):
+    df = ds.raw_quit
+
+    return None, lambda: find_implicit_duplicates(df)
+
+
+@benchmark('find_implicit_duplicates.category')
+def bench_find_implicit_duplicates_category(ds):
+    df = ds.clean_quit
+
+    return None, lambda: find_implicit_duplicates(df)
+
+
+@benchmark('profile_frame')
+def bench_profile_frame(ds):
+    df = ds.raw_quit
+
+    return None, lambda: profile_frame(df, use_cache=False)
+
+
+@benchmark('profile_frame.category')
+def bench_profile_frame_category(ds):
+    df = ds.clean_quit
+
+    return None, lambda: profile_frame(df, use_cache=False)
+
+
+@benchmark('profile_frame.approx')
+def bench_profile_frame_approx(ds):
+    df = ds.raw_quit
+
+    return None, lambda: profile_frame(df, use_cache=False, approx=True, random_state=RANDOM_STATE)
+
+
+@benchmark('cols_names_cleaner')
+def bench_cols_names_cleaner(ds):
+    return lambda: ds.raw('quit'), cols_names_cleaner
+
+
+@benchmark('convert_columns_dtype')
+def bench_convert_columns_dtype(ds):
+    return lambda: ds.clean('quit'), lambda df: convert_columns_dtype(df, FEATURES_DTYPE_MAP)
+
+
+@benchmark('smape_score')
+def bench_smape_score(ds):
+    y_true = ds.y_jsr
+    y_pred = np.random.default_rng(RANDOM_STATE).permutation(y_true)
+
+    return None, lambda: smape_score(y_true, y_pred)
+
+
+@benchmark('build_pipeline.fit_transform')
+def bench_preprocessor_fit_transform(ds):
+    X, y = ds.Xy('jsr')
+    preprocessor = build_pipeline(**ds.pipeline_params('jsr')).named_steps.preprocessor
+
+    return None, lambda: clone(preprocessor).fit_transform(X, y)
+
+
+@benchmark('build_pipeline.transform')
+def bench_preprocessor_transform(ds):
+    X, y = ds.Xy('jsr')
+    preprocessor = build_pipeline(**ds.pipeline_params('jsr')).named_steps.preprocessor.fit(X, y)
+
+    return None, lambda: preprocessor.transform(X)
+
+
+def fitted_model_pipeline(ds, task, model):
+    X, y = ds.Xy(task)
+    pipeline = build_pipeline(**ds.pipeline_params(task), model=clone(model))
+
+    return pipeline.fit(X, y), X, y
+
+
+def register_model_family(task, param_dist):
+    name = get_model_name(param_dist)
+    model = param_dist['model'][0]
+    # Точные ядерные модели и KNN не масштабируются на сотни тысяч строк
+    max_rows = 20_000 if name in ('SVR', 'SVC', 'KNeighborsRegressor', 'KNeighborsClassifier') else None
+    # Явное отображение Nystroem - плотная матрица n_rows × n_components
+    max_rows = 100_000 if '+' in name else max_rows
+
+    @benchmark(f'{task}.{name}.fit', max_rows)
+    def bench_fit(ds):
+        X, y = ds.Xy(task)
+        pipeline = build_pipeline(**ds.pipeline_params(task), model=clone(model))
+
+        return None, lambda: clone(pipeline).fit(X, y)
+
+    @benchmark(f'{task}.{name}.predict', max_rows)
+    def bench_predict(ds):
+        pipeline, X, _ = fitted_model_pipeline(ds, task, model)
+
+        return None, lambda: pipeline.predict(X)
+
+
+for task, grid_task in (('jsr', 'reg'), ('quit', 'clf')):
+    for param_dist in construct_param_grid_sklearn(grid_task):
+        register_model_family(task, param_dist)
+
+
+# Точная SVM и приближения ядра с одними gamma и C: время обучения и
+# предсказания и метрика на отложенных 20% строк (паритет качества)
+KERNEL_APPROX_MAX_ROWS = {'exact': 20_000, 'nystroem': 100_000, 'rff': 100_000}
+
+
+def kernel_approx_pipeline(ds, task, kernel_approx):
+    X, y = ds.Xy(task)
+    split = len(X) - len(X) // 5
+    params = ds.pipeline_params(task)
+    X_preprocessed = build_pipeline(**params).named_steps.preprocessor.fit_transform(X.iloc[:split], y[:split])
+    gamma, C = get_rbf_params(build_exact_svm_model(params['task'], 'scale', 1.0), X_preprocessed)
+
+    if kernel_approx == 'exact':
+        model = build_exact_svm_model(params['task'], gamma, C)
+    else:
+        model = build_kernel_approx_model(params['task'], kernel_approx).set_params(kernel__gamma=gamma, linear__C=C)
+
+    return build_pipeline(**params, model=model), (X.iloc[:split], y[:split]), (X.iloc[split:], y[split:])
+
+
+def register_kernel_approx(task, kernel_approx, max_rows):
+    scorer = smape_scorer if task == 'jsr' else get_scorer('roc_auc')
+
+    @benchmark(f'{task}.kernel_approx.{kernel_approx}.fit', max_rows)
+    def bench_fit(ds):
+        pipeline, (X_train, y_train), (X_test, y_test) = kernel_approx_pipeline(ds, task, kernel_approx)
+
+        return (
+            None,
+            lambda: clone(pipeline).fit(X_train, y_train),
+            lambda fitted: abs(scorer(fitted, X_test, y_test))
+        )
+
+    @benchmark(f'{task}.kernel_approx.{kernel_approx}.predict', max_rows)
+    def bench_predict(ds):
+        pipeline, (X_train, y_train), (X_test, _) = kernel_approx_pipeline(ds, task, kernel_approx)
+        pipeline.fit(X_train, y_train)
+
+        return None, lambda: pipeline.predict(X_test)
+
+
+for task in ('jsr', 'quit'):
+    for kernel_approx, max_rows in KERNEL_APPROX_MAX_ROWS.items():
+        register_kernel_approx(task, kernel_approx, max_rows)
+
+
+@benchmark('permutation_importance', max_rows=100_000)
+def bench_permutation_importance(ds):
+    pipeline, X, y = fitted_model_pipeline(ds, 'jsr', construct_param_grid_sklearn('reg')[0]['model'][0])
+    X_preprocessed = pipeline.named_steps.preprocessor.transform(X)
+    model = pipeline.named_steps.model
+
+    return None, lambda: permutation_importance(
+        model,
+        X_preprocessed,
+        y,
+        scoring=smape_scorer,
+        n_repeats=5,
+        random_state=RANDOM_STATE
+    )
+
+
+@benchmark('permutation_importance.grouped', max_rows=100_000)
+def bench_permutation_importance_grouped(ds):
+    # Та же модель, one-hot столбцы переставляются вместе, повторы - до сходимости
+    pipeline, X, y = fitted_model_pipeline(ds, 'jsr', construct_param_grid_sklearn('reg')[0]['model'][0])
+    preprocessor = pipeline.named_steps.preprocessor
+    X_preprocessed = preprocessor.transform(X)
+    model = pipeline.named_steps.model
+
+    return None, lambda: permutation_importance_grouped(
+        model,
+        X_preprocessed,
+        y,
+        scoring=smape_scorer,
+        groups=get_feature_groups(preprocessor),
+        n_jobs=1,
+        random_state=RANDOM_STATE
+    )
+
+
+@benchmark('permutation_importance.pipeline.sklearn', max_rows=100_000)
+def bench_permutation_importance_pipeline_sklearn(ds):
+    # Важность исходных столбцов: препроцессор пересчитывается на каждую перестановку
+    pipeline, X, y = fitted_model_pipeline(ds, 'jsr', construct_param_grid_sklearn('reg')[0]['model'][0])
+
+    return None, lambda: permutation_importance(
+        pipeline,
+        X,
+        y,
+        scoring=smape_scorer,
+        n_repeats=5,
+        random_state=RANDOM_STATE
+    )
+
+
+@benchmark('permutation_importance.pipeline', max_rows=100_000)
+def bench_permutation_importance_pipeline(ds):
+    pipeline, X, y = fitted_model_pipeline(ds, 'jsr', construct_param_grid_sklearn('reg')[0]['model'][0])
+
+    return None, lambda: pipeline_permutation_importance(
+        pipeline,
+        X,
+        y,
+        scoring=smape_scorer,
+        max_repeats=5,
+        n_jobs=1,
+        random_state=RANDOM_STATE
+    )
+
+
+@benchmark('shap.PermutationExplainer', max_rows=4_000)
+def bench_shap_permutation(ds):
+    # Как в ноутбуке: SVR на предобработанных данных
+    pipeline, X, _ = fitted_model_pipeline(ds, 'jsr', construct_param_grid_sklearn('reg')[2]['model'][0])
+    X_preprocessed = pipeline.named_steps.preprocessor.transform(X)
+    model = pipeline.named_steps.model
+
+    def run():
+        explainer = shap.Explainer(model.predict, shap.sample(X_preprocessed, SHAP_BACKGROUND, random_state=RANDOM_STATE))
+        return explainer(X_preprocessed[:SHAP_ROWS], silent=True)
+
+    return None, run
+
+
+@benchmark('explain', max_rows=4_000)
+def bench_explain(ds):
+    # Те же модель, фон и строки, что в shap.PermutationExplainer
+    pipeline, X, _ = fitted_model_pipeline(ds, 'jsr', construct_param_grid_sklearn('reg')[2]['model'][0])
+    X_preprocessed = pipeline.named_steps.preprocessor.transform(X)
+    model = pipeline.named_steps.model
+    background = shap.sample(X_preprocessed, SHAP_BACKGROUND, random_state=RANDOM_STATE)
+
+    return None, lambda: explain(model.predict, X_preprocessed[:SHAP_ROWS], background, random_state=RANDOM_STATE)
+
+
+@benchmark('shap.TreeExplainer', max_rows=100_000)
+def bench_shap_tree(ds):
+    pipeline, X, _ = fitted_model_pipeline(ds, 'jsr', construct_param_grid_sklearn('reg')[0]['model'][0])
+    X_preprocessed = pipeline.named_steps.preprocessor.transform(X)
+    model = pipeline.named_steps.model
+
+    return None, lambda: shap.TreeExplainer(model)(X_preprocessed[:1000])
+
+
+@benchmark('explain_model.tree', max_rows=100_000)
+def bench_explain_model_tree(ds):
+    # Точные интервенционные значения по фону, как у explain
+    pipeline, X, _ = fitted_model_pipeline(ds, 'jsr', construct_param_grid_sklearn('reg')[0]['model'][0])
+    X_preprocessed = pipeline.named_steps.preprocessor.transform(X)
+    model = pipeline.named_steps.model
+    background = shap.sample(X_preprocessed, SHAP_BACKGROUND, random_state=RANDOM_STATE)
+
+    return None, lambda: explain_model(model, X_preprocessed[:1000], background)
+
+
+# Как в ноутбуке: зарплата и целевой признак - интервальные, остальные - категориальные
+PHIK_INTERVAL_COLS = ['salary', 'job_satisfaction_rate']
+
+
+@benchmark('phik_matrix')
+def bench_phik_matrix(ds):
+    df = ds.clean_jsr
+
+    return None, lambda: phik_matrix(df, interval_cols=PHIK_INTERVAL_COLS, n_jobs=1, use_cache=False)
+
+
+@benchmark('phik_matrix.phik', max_rows=100_000)
+def bench_phik_matrix_reference(ds):
+    # Исходная реализация пакета phik для сравнения
+    df = ds.clean_jsr
+
+    return None, lambda: df.phik_matrix(interval_cols=PHIK_INTERVAL_COLS, njobs=1)
+
+
+@benchmark('phik_matrix.incremental')
+def bench_phik_matrix_incremental(ds):
+    # Обновление матрицы пакетом из 10% новых строк; в setup - частоты остальных 90%
+    df = ds.clean_jsr
+    split = len(df) - len(df) // 10
+
+    def setup():
+        return IncrementalPhiK(PHIK_INTERVAL_COLS, n_jobs=1).update(df.iloc[:split])
+
+    return setup, lambda corr: corr.update(df.iloc[split:]).phik_matrix()
+
+
+# Эталон segment_report: исходный расчет ноутбука, groupby('dept').apply по каждому сегменту
+def dept_agg(df):
+    return pd.Series({
+        'Сотрудники (всего)': len(df),
+        'Грейд (мода)': df['level'].mode()[0],
+        'Зарплата (медиана)': np.median(df['salary']),
+        'Длительность (ср)': np.round(np.mean(df['employment_years']), 1),
+        'Оценка (мода)': df['supervisor_evaluation'].mode()[0],
+        'Загрузка (мода)': df['workload'].mode()[0],
+        'Повышений (%)': np.round(df['last_year_promo_yes'].mean()*100, 1),
+        'Нарушений (%)': np.round(df['last_year_violations_yes'].mean()*100, 1),
+        'Удовлетворенность (ср)': np.round(df['jsr_predict'].mean(), 2),
+        'Вероятность увольнения (ср)': np.round(df['quit_predict'].mean(), 2),
+    })
+
+
+@benchmark('dept_agg')
+def bench_dept_agg(ds):
+    rng = np.random.default_rng(RANDOM_STATE)
+    segment_data = ds.clean_quit.drop(columns='quit').assign(
+        jsr_predict=rng.random(ds.n_rows),
+        quit_predict=rng.random(ds.n_rows)
+    )
+    segment_data = pd.get_dummies(segment_data, columns=['last_year_promo', 'last_year_violations'])
+
+    high_risk_segment = segment_data.query('jsr_predict <= 0.4 & quit_predict >= 0.6')
+    low_risk_segment = segment_data.drop(high_risk_segment.index)
+
+    return None, lambda: [
+        df.groupby('dept', observed=True).apply(dept_agg)
+        for df in (high_risk_segment, low_risk_segment)
+    ]
+
+
+@benchmark('segment_report')
+def bench_segment_report(ds):
+    rng = np.random.default_rng(RANDOM_STATE)
+    segment_data = ds.clean_quit.drop(columns='quit').assign(
+        jsr_predict=rng.random(ds.n_rows),
+        quit_predict=rng.random(ds.n_rows)
+    )
+    segment_data = pd.get_dummies(segment_data, columns=['last_year_promo', 'last_year_violations'])
+    segment = pd.Series(
+        pd.Categorical(
+            np.where(segment_data.eval('jsr_predict <= 0.4 & quit_predict >= 0.6'), 'Целевой', 'Нецелевой'),
+            categories=['Целевой', 'Нецелевой']
+        ),
+        index=segment_data.index
+    )
+
+    return None, lambda: segment_report(segment_data, segment)
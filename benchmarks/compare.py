@@ -0,0 +1,61 @@
+'''
+Сравнение двух JSON-результатов benchmarks.run по медиане времени
+
+    python -m benchmarks.compare base.json head.json --threshold 1.1
+
+Код возврата 1, если хотя бы один бенчмарк замедлился сильнее порога
+'''
+
+import argparse
+import json
+import sys
+
+import pandas as pd
+
+THRESHOLD = 1.1
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+
+    results = pd.DataFrame(report['results']).set_index(['name', 'n_rows'])['median']
+
+    return report['commit'], results
+
+
+def compare(base_path, head_path, threshold=THRESHOLD):
+    base_commit, base = load_results(base_path)
+    head_commit, head = load_results(head_path)
+
+    comparison = pd.concat([base, head], axis=1, keys=['base', 'head'], join='inner')
+    comparison['ratio'] = comparison['head'] / comparison['base']
+    comparison['status'] = pd.cut(
+        comparison['ratio'],
+        bins=[0, 1 / threshold, threshold, float('inf')],
+        labels=['faster', '', 'SLOWER']
+    )
+
+    comparison.attrs['commits'] = (base_commit, head_commit)
+
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.compare')
+    parser.add_argument('base', help='JSON базового коммита')
+    parser.add_argument('head', help='JSON проверяемого коммита')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='Допустимое отношение медиан head/base')
+    args = parser.parse_args(argv)
+
+    comparison = compare(args.base, args.head, args.threshold)
+    print('base: {}, head: {} (медиана, сек.)'.format(*comparison.attrs['commits']))
+
+    with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.float_format', '{:.4f}'.format):
+        print(comparison)
+
+    sys.exit(int((comparison['status'] == 'SLOWER').any()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+'''
+Синтетические датасеты для бенчмарков нужного размера: генератор
+hr_analytics.datagen воспроизводит совместные распределения признаков,
+пропуски и опечатки исходных CSV
+'''
+
+import os
+
+from functools import cache, cached_property
+
+import pandas as pd
+
+from sklearn.preprocessing import StandardScaler
+
+from hr_analytics.data import (
+    convert_columns_dtype,
+    load_data,
+    text_vals_to_nan
+)
+from hr_analytics.datagen import HRDataGenerator
+from hr_analytics.modeling import RANDOM_STATE
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCES = {
+    'jsr': 'train_job_satisfaction_rate.csv',
+    'quit': 'train_quit.csv',
+}
+TARGETS = {
+    'jsr': 'job_satisfaction_rate',
+    'quit': 'quit',
+}
+SIZES = [4_000, 20_000, 100_000, 1_000_000]
+
+# Те же столбцы и типы, что и в ноутбуке
+OHE_COLUMNS = ['last_year_violations', 'last_year_promo', 'dept']
+ORD_COLUMNS = ['level', 'workload']
+NUM_COLUMNS = ['employment_years', 'salary', 'supervisor_evaluation']
+FEATURES_DTYPE_MAP = {
+    'dept': 'category',
+    'level': 'category',
+    'workload': 'category',
+    'last_year_promo': 'category',
+    'last_year_violations': 'category',
+    'supervisor_evaluation': 'category',
+}
+
+
+@cache
+def get_generator(task):
+    return HRDataGenerator().fit(pd.read_csv(os.path.join(DATA_DIR, SOURCES[task])))
+
+
+def make_raw(task, n_rows, random_state=RANDOM_STATE):
+    return pd.concat(get_generator(task).generate(n_rows, random_state=random_state), ignore_index=True)
+
+
+class Dataset:
+    '''
+    Данные одного размера для всех бенчмарков: каждая заготовка (CSV на диске,
+    очищенная таблица, выборки для моделей) строится один раз при первом обращении
+    '''
+
+    def __init__(self, n_rows, workdir, random_state=RANDOM_STATE):
+        self.n_rows = n_rows
+        self.workdir = workdir
+        self.random_state = random_state
+
+    def raw(self, task):
+        return getattr(self, f'raw_{task}').copy()
+
+    @cached_property
+    def raw_jsr(self):
+        return make_raw('jsr', self.n_rows, self.random_state)
+
+    @cached_property
+    def raw_quit(self):
+        return make_raw('quit', self.n_rows, self.random_state)
+
+    @cached_property
+    def csv_path(self):
+        path = os.path.join(self.workdir, f'train_quit_{self.n_rows}.csv')
+        self.raw_quit.to_csv(path, index=False)
+
+        return path
+
+    def clean(self, task):
+        df = self.raw(task).set_index('id')
+        df = text_vals_to_nan(df)
+        df['level'] = df['level'].replace({'sinior': 'senior'})
+
+        return df
+
+    @cached_property
+    def clean_jsr(self):
+        return self.clean('jsr')
+
+    @cached_property
+    def clean_quit(self):
+        return convert_columns_dtype(self.clean('quit'), FEATURES_DTYPE_MAP)
+
+    @cached_property
+    def X_jsr(self):
+        return self.clean_jsr.drop(columns=TARGETS['jsr'])
+
+    @cached_property
+    def y_jsr(self):
+        return self.clean_jsr[TARGETS['jsr']].to_numpy()
+
+    @cached_property
+    def X_quit(self):
+        return self.clean('quit').drop(columns=TARGETS['quit'])
+
+    @cached_property
+    def y_quit(self):
+        return (self.clean_quit[TARGETS['quit']] == 'yes').to_numpy().astype(int)
+
+    def Xy(self, task):
+        return getattr(self, f'X_{task}'), getattr(self, f'y_{task}')
+
+    def pipeline_params(self, task):
+        X = self.X_jsr
+
+        return {
+            'task': 'reg' if task == 'jsr' else 'clf',
+            'ohe_columns': OHE_COLUMNS,
+            'ord_columns': ORD_COLUMNS,
+            'num_columns': NUM_COLUMNS,
+            'ord_categories': [list(X.level.unique()), list(X.workload.unique())],
+            'num_scaler': StandardScaler(),
+        }
+
+    def load(self, **params):
+        return load_data(self.csv_path, index_col='id', cache_dir=None, **params)
+
+    def load_cached(self, **params):
+        return load_data(self.csv_path, index_col='id', cache_dir=os.path.join(self.workdir, 'parquet'), **params)
@@ -0,0 +1,142 @@
+'''
+Запуск бенчмарков и сохранение результатов в JSON для сравнения коммитов
+
+    python -m benchmarks.run --sizes 4000 100000 --filter "jsr\\." --repeat 5
+'''
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import tempfile
+import time
+import warnings
+
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from benchmarks.cases import BENCHMARKS
+from benchmarks.datasets import SIZES, Dataset
+
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+REPEAT = 3
+
+
+def get_commit():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True, check=True
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+    return commit, dirty
+
+
+def time_benchmark(setup, run, repeat=REPEAT):
+    times = []
+    output = None
+
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+
+        start = time.perf_counter()
+        output = run(state) if setup is not None else run()
+        times.append(time.perf_counter() - start)
+
+    return times, output
+
+
+def run_benchmarks(sizes=SIZES, pattern=None, repeat=REPEAT):
+    results = []
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_rows in sizes:
+            ds = Dataset(n_rows, workdir)
+
+            for name, case in BENCHMARKS.items():
+                if pattern is not None and not re.search(pattern, name):
+                    continue
+
+                if case['max_rows'] is not None and n_rows > case['max_rows']:
+                    continue
+
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    setup, run, *score = case['func'](ds)
+                    times, output = time_benchmark(setup, run, repeat)
+                    score = float(score[0](output)) if score else None
+
+                result = {
+                    'name': name,
+                    'n_rows': n_rows,
+                    'repeat': repeat,
+                    'times': times,
+                    'min': min(times),
+                    'median': statistics.median(times),
+                    'mean': statistics.mean(times),
+                }
+
+                if score is not None:
+                    result['score'] = score
+
+                results.append(result)
+
+                print(
+                    f'{name:<45} {n_rows:>10,} {result["median"]:>12.4f} сек.'
+                    + (f'  метрика {score:.4f}' if score is not None else ''),
+                    flush=True
+                )
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.run')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='Размеры датасетов (строк)')
+    parser.add_argument('--filter', dest='pattern', help='Регулярное выражение по имени бенчмарка')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='Кол-во повторов замера')
+    parser.add_argument('--output', help=f'Файл результатов (по умолчанию {RESULTS_DIR}/<commit>.json)')
+    args = parser.parse_args(argv)
+
+    commit, dirty = get_commit()
+    results = run_benchmarks(args.sizes, args.pattern, args.repeat)
+
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+        },
+        'versions': {
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+        },
+        'results': results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}{"-dirty" if dirty else ""}.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f'Результаты: {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -86,73 +86,66 @@
 
 # Стандартные библиотеки
 import os
+import time
 import warnings
 
-from io import StringIO
+from functools import cache
 from IPython.display import display, Markdown
-from joblib import Memory
 
 # Сторонние библиотеки
 import matplotlib.pyplot as plt
 import numpy as np
-import optuna
 import pandas as pd
-import phik
 import seaborn as sns
 import shap
 
-from optuna.distributions import (
-    CategoricalDistribution,
-    IntDistribution,
-    FloatDistribution
-)
-from optuna.integration import OptunaSearchCV
 from scipy.stats import ttest_ind
-from sklearn.compose import ColumnTransformer
+from sklearn.base import clone
 from sklearn.dummy import (
     DummyRegressor,
     DummyClassifier
 )
-from sklearn.impute import SimpleImputer
-from sklearn.inspection import permutation_importance
-from sklearn.linear_model import (
-    LogisticRegression, 
-    LinearRegression
-)
 from sklearn.metrics import (
-    make_scorer,
+    check_scoring,
     roc_auc_score
 )
 from sklearn.model_selection import (
-    GridSearchCV,
-    RandomizedSearchCV,
     KFold,
     StratifiedKFold
 )
-from sklearn.neighbors import (
-    KNeighborsClassifier,
-    KNeighborsRegressor
-)
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import (
-    LabelEncoder,
-    MinMaxScaler,
-    OneHotEncoder,
-    OrdinalEncoder,
-    PolynomialFeatures,
-    RobustScaler,
-    StandardScaler,
+from sklearn.preprocessing import LabelEncoder
+from tqdm.auto import tqdm
+
+# Локальные модули
+from hr_analytics.artifacts import save_artifacts
+from hr_analytics.compiled import compile_pipeline
+from hr_analytics.correlation import phik_matrix
+from hr_analytics.data import (
+    convert_columns_dtype,
+    find_implicit_duplicates,
+    load_data,
+    text_vals_to_nan
 )
-from sklearn.svm import (
-    SVR,
-    SVC
+from hr_analytics.explain import explain_model
+from hr_analytics.importance import pipeline_permutation_importance
+from hr_analytics.modeling import (
+    BoundedMemory,
+    build_exact_svm_model,
+    build_kernel_approx_model,
+    build_pipeline,
+    construct_param_grid_optuna,
+    construct_param_grid_sklearn,
+    get_rbf_params,
+    smape_score,
+    smape_scorer
 )
-from sklearn.tree import (
-    DecisionTreeRegressor,
-    DecisionTreeClassifier
+from hr_analytics.profiling import profile_frame
+from hr_analytics.search import (
+    calibrate_pipeline,
+    run_search
 )
-from tqdm.auto import tqdm
-from tqdm_joblib import tqdm_joblib
+from hr_analytics.segments import segment_report
 
 # Настройка параметров пространства
 # Настройка стилей
@@ -206,54 +199,44 @@ TARGET_QUIT = 'quit'
 
 RANDOM_STATE = 42
 
+# Кол-во процессов для поиска моделей (-1 - все доступные ядра)
+N_JOBS = -1
+
+# Кэш обученных препроцессоров: общий для всех фолдов и кандидатов поиска
+CACHE_DIR = os.path.join('.cache', 'transformers')
+CACHE_BYTES_LIMIT = '2G'
+
 
 # ## Загрузка и изучение данных
 # ___
 
 # ### Подготовка методов для загрузки и изучения
 
-# In[3]:
-
-
-def load_data(filename, remote_path=None, **params):
-    local_file = os.path.join(filename)
-    
-    if os.path.exists(filename):
-        source = local_file
-        source_type = 'Локальный'
-    else:
-        source = f'{remote_path.rstrip("/")}/{filename}'
-        source_type = 'URL'
-
-    df = pd.read_csv(source, **params)
-    df.attrs['name'] = filename
-
-    display(Markdown(
-        f'#### Файл `{filename}` загружен из источника `{source_type}`\n___'
-    ))
-
-    return df
-
-
 # In[4]:
 
 
-def get_df_overview(df, discrete=None, section_name=None):
+def get_df_overview(df, discrete=None, section_name=None, approx=False):
     display(Markdown(f'## 🔎 Обзор данных `{df.attrs["name"]}`\n___'))
 
     def section(title):
         display(Markdown(f'### {title}\n___\n'))
     
+    # Все статистики по столбцам считаются за один проход при первом обращении
+    # (approx=True - приближенные оценки по скетчам с погрешностями для больших таблиц)
+    @cache
+    def profile():
+        return profile_frame(df, approx=approx)
+    
     def show_info():
         section('Информация о DataFrame')
-        buffer = StringIO()
-        df.info(buf=buffer)
-        info_str = buffer.getvalue()
-        display(Markdown(f'```{info_str}```'))
+        display(Markdown(
+            f'**Размерность:** {df.shape}, **память:** {profile().memory_usage / 2 ** 20:.2f} MB'
+        ))
+        display(profile().columns[['dtype', 'non_null']])
         
     def show_description():
         section('Статистическое описание данных')
-        display(df.describe())
+        display(profile().describe)
         
     def show_sample():
         section('5 случайных строк')
@@ -261,14 +244,16 @@ def get_df_overview(df, discrete=None, section_name=None):
         
     def show_unique():
         section('Кол-во уникальных значений')
-        unique_vals = df.nunique().sort_values(ascending=False).to_frame('unique_values')
+        unique_vals = profile().columns['unique'].sort_values(ascending=False).to_frame('unique_values')
+        
+        if approx:
+            unique_vals['relative_error'] = profile().columns['unique_error']
         display(unique_vals)
         
     def show_missing():
         section('Кол-во пропущенных значений')
         
-        missing = df.isna().sum().to_frame('missing_values')
-        missing['missing_pct'] = (missing['missing_values'] / len(df) * 100).round(2)
+        missing = profile().columns[['missing', 'missing_pct']].rename(columns={'missing': 'missing_values'})
         
         if missing['missing_values'].sum() == 0:
             display(Markdown('✅ **Пропуски отсутствуют!**'))
@@ -278,7 +263,7 @@ def get_df_overview(df, discrete=None, section_name=None):
         
     def show_duplicates_explicit():
         section('Явные дубликаты')
-        count = df.index.duplicated().sum()
+        count = profile().index_duplicates
         
         if count == 0:
             display(Markdown('✅ Явные дубликаты **отсутствуют!**'))
@@ -289,19 +274,12 @@ def get_df_overview(df, discrete=None, section_name=None):
     def show_duplicates_implicit():
         section('Неявные дубликаты')
         
-        found = False
+        duplicates = find_implicit_duplicates(df)
         
-        for col in df.select_dtypes(include=['object', 'category']):
-            vals = df[col].dropna().astype(str)
-            normed = vals.str.lower().str.strip()
-            rev = vals.groupby(normed).unique()
-            
-            for norm_val, origs in rev.items():
-                if len(origs) > 1:
-                    found = True
-                    display(Markdown(f'- **{col}**: {list(origs)} → нормализовано в `{norm_val}`'))
+        for col, origs, norm_val in duplicates.itertuples(index=False):
+            display(Markdown(f'- **{col}**: {origs} → нормализовано в `{norm_val}`'))
                     
-        if not found:
+        if duplicates.empty:
             display(Markdown('✅ Неявные дубликаты **отсутствуют!**'))
                     
     def show_fast_plot_analysis(df=df, discrete=discrete):
@@ -410,6 +388,11 @@ df_test_job_satisfaction_rate = load_data('test_target_job_satisfaction_rate.csv
 df_train_quit = load_data('train_quit.csv', **params)
 df_test_quit = load_data('test_target_quit.csv', **params)
 
+for df in [df_test_features, df_train_job_satisfaction_rate, df_test_job_satisfaction_rate, df_train_quit, df_test_quit]:
+    display(Markdown(
+        f'#### Файл `{df.attrs["name"]}` загружен из источника `{df.attrs["source_type"]}`\n___'
+    ))
+
 
 # ### Изучение `df_test_features`
 # ---
@@ -501,82 +484,29 @@ get_df_overview(df_train_quit, ['supervisor_evaluation', 'employment_years'])
 # ### Подготовка методов для предобработки
 # ___
 
-# In[11]:
-
-
-def cols_names_cleaner(df):
-    df.columns = (
-        df
-        .columns
-        .str.lower()
-        .str.replace(' ', '_')
-    )
-    
-    return df
-
-
-# In[12]:
-
-
-def text_vals_cleaner(x):
-    x = (
-        x
-        .str.lower()
-        .str.replace(' ', '_')
-    )
-        
-    return x
-
-
-# In[13]:
+# In[14]:
 
 
-def text_vals_to_nan(df):
-    mask = df.select_dtypes(include=['object', 'category']).columns
-    
-    before = df[mask].isna().sum()
+def get_short_df_info(df, approx=False):
+    profile = profile_frame(df, approx=approx).columns
     
-    df[mask] = df[mask].replace(r'^\s*$', np.nan, regex=True)
-    
-    after = df[mask].isna().sum()
-    
-    display(Markdown(f'### Значений найдено заменено на NaN:\n___'))
-    display(after - before)
+    main_info = pd.DataFrame({
+        'Тип данных': profile['dtype'],
+        'Уник. всего.': profile['unique'],
+        'Уник. значения': profile['values'],
+        'NaN (кол-во.)': profile['missing'],
+        'NaN (%)': (profile['missing'] / len(df)).round(4),
+    })
     
-    return df
-
-
-# In[14]:
-
-
-def get_short_df_info(df):
-    results = []
-   
-    for col in df:
-        results.append({
-            'Тип данных': df[col].dtype,
-            'Уник. всего.': df[col].nunique(),
-            'Уник. значения': df[col].unique(),
-            'NaN (кол-во.)': df[col].isna().sum(),
-            'NaN (%)': df[col].isnull().mean().round(4),
-        })
-        
-    main_info = pd.DataFrame(data=results).set_index(df.columns)
+    if approx:
+        # Погрешности приближенного режима рядом со статистиками
+        main_info.insert(2, 'Уник. (отн. погрешность)', profile['unique_error'])
+        main_info.insert(4, 'Частоты (занижены не более чем на)', profile['values_error'])
     main_info = main_info.style.set_caption(f'Проверочные данные по датафрейму \ Размерность: {df.shape}')
     
     return main_info
 
 
-# In[15]:
-
-
-def convert_columns_dtype(df, dtype_mapping):
-    for col, dtype in dtype_mapping.items():
-        if col in df.columns:
-            df[col] = df[col].astype(dtype)
-    return df
-
-
 # ### Подготовка копий для работы
 # ___
 
@@ -613,8 +543,12 @@ get_short_df_info(test_features_cleaned)
 
 
 # Заполнение пробелов в данных на NaN
+nan_before = test_features_cleaned.isna().sum()
 test_features_cleaned = text_vals_to_nan(test_features_cleaned)
 
+display(Markdown(f'### Значений найдено заменено на NaN:\n___'))
+display(test_features_cleaned.isna().sum() - nan_before)
+
 
 # In[19]:
 
@@ -962,7 +896,15 @@ def show_full_analysis_plots(df, analysis_type='full'):
 # In[39]:
 
 
-def show_corr_heatmap_plot(corr_matrix, corr_mask):
+def get_upper_triangle_mask(corr_matrix):
+    # Пары признаков над диагональю: каждая пара один раз
+    return np.triu(np.ones(corr_matrix.shape), k=1)
+
+
+def show_corr_heatmap_plot(corr_matrix, corr_mask=None):
+    if corr_mask is None:
+        corr_mask = get_upper_triangle_mask(corr_matrix)
+    
     fig, ax_1 = plt.subplots(
         figsize=(16, 14),
     )
@@ -994,49 +936,49 @@ def show_corr_heatmap_plot(corr_matrix, corr_mask):
 # In[40]:
 
 
-def get_corr_levels(corr_matrix, corr_mask, target=None):
-    levels = {
-        1.00: 'Очень высокая',
-        0.70: 'Высокая',
-        0.50: 'Средняя',
-        0.19: 'Слабая',
-        0.00: 'Очень слабая'
-    }
+CORR_LEVELS = np.array([0.00, 0.19, 0.50, 0.70, 1.00])
+CORR_LABELS = np.array(['Отсутствует', 'Очень слабая', 'Слабая', 'Средняя', 'Высокая', 'Очень высокая'])
+
+
+def get_corr_levels(corr_matrix, corr_mask=None, target=None, top=None):
+    # Индексы пар над диагональю (или по своей маске) без промежуточной матрицы с NaN
+    if corr_mask is None:
+        rows, cols = np.triu_indices(len(corr_matrix), k=1)
+    else:
+        rows, cols = np.nonzero(np.asarray(corr_mask).astype(bool))
+    
+    values = corr_matrix.to_numpy()[rows, cols]
+    observed = ~np.isnan(values)
+    rows, cols, values = rows[observed], cols[observed], values[observed].round(2)
+    # Номер пары среди всех пар - индекс строки результата
+    positions = np.arange(len(values))
+    
+    if target is not None:
+        target_pos = corr_matrix.columns.get_loc(target)
+        is_target = (rows == target_pos) | (cols == target_pos)
+        rows, cols, values, positions = rows[is_target], cols[is_target], values[is_target], positions[is_target]
+    
+    # top - только top пар с наибольшей корреляцией, без сортировки всех пар
+    if top is not None and top < len(values):
+        best = np.argpartition(-values, top - 1)[:top]
+        rows, cols, values, positions = rows[best], cols[best], values[best], positions[best]
+    
+    pairs = pd.DataFrame(index=positions, data={
+        'feat_1': corr_matrix.index[rows],
+        'feat_2': corr_matrix.columns[cols],
+        'corr': values,
+        # Индекс уровня: значение не меньше нижней границы уровня
+        'lvl': CORR_LABELS[np.digitize(values, CORR_LEVELS)]
+    })
     
-    def interpret(value):        
-        for (lvl, label) in levels.items():
-            if value >= lvl:
-                return label
-        return 'Отсутствует'
-        
-    pairs = (
-        corr_matrix
-        .where(corr_mask.astype(bool))
-        .stack()
-        .reset_index()
-    )
-        
-    pairs.columns = ['feat_1', 'feat_2', 'corr']
-    pairs['corr'] = pairs['corr'].round(2)
-    pairs['lvl'] = pairs['corr'].apply(interpret)
+    pairs = pairs.sort_values('corr', ascending=False)
     
-    if target is not None:        
-        target_feature_corr = (
-            pairs[(pairs['feat_1'] == target) | (pairs['feat_2'] == target)]
-            .sort_values(
-                'corr',
-                ascending=False)
-        )
-        
+    if target is not None:
         display(Markdown(f'## Корреляция по целевому признаку: `{target}`\n___\n'))
-        
-        return target_feature_corr
-    else:        
-        all_features_corr = pairs.sort_values('corr', ascending=False)
-        
+    else:
         display(Markdown(f'## Корреляции по всем признакам\n___\n'))
-        
-        return all_features_corr
+    
+    return pairs
 
 
 # In[41]:
@@ -1359,31 +1301,17 @@ test_features_interval_cols = (
 )
 
 # Настройки матрицы
-test_features_corr_matrix = (
-    test_features_cleaned
-    .phik_matrix(interval_cols=test_features_interval_cols)
-)
-
-test_features_corr_mask = (
-    np
-    .triu(np.ones(test_features_corr_matrix.shape), k=1)
-)
+test_features_corr_matrix = phik_matrix(test_features_cleaned, interval_cols=test_features_interval_cols)
 
 # Отображение матрицы
-show_corr_heatmap_plot(
-    test_features_corr_matrix,
-    test_features_corr_mask
-)
+show_corr_heatmap_plot(test_features_corr_matrix)
 
 
 # In[47]:
 
 
 # Формирование таблицы уровней корреляции
-test_features_corr_lvls = get_corr_levels(
-    test_features_corr_matrix,
-    test_features_corr_mask
-)
+test_features_corr_lvls = get_corr_levels(test_features_corr_matrix)
 
 test_features_corr_lvls.head(5)
 
@@ -1463,21 +1391,10 @@ train_jsr_interval_cols = (
 )
 
 # Настройки матрицы
-train_jsr_corr_matrix = (
-    train_jsr_cleaned
-    .phik_matrix(interval_cols=train_jsr_interval_cols)
-)
-
-train_jsr_corr_mask = (
-    np
-    .triu(np.ones(train_jsr_corr_matrix.shape),k=1)
-)
+train_jsr_corr_matrix = phik_matrix(train_jsr_cleaned, interval_cols=train_jsr_interval_cols)
 
 # Отображение матрицы
-show_corr_heatmap_plot(
-    train_jsr_corr_matrix,
-    train_jsr_corr_mask
-)
+show_corr_heatmap_plot(train_jsr_corr_matrix)
 
 
 # In[51]:
@@ -1486,7 +1403,6 @@ show_corr_heatmap_plot(
 # Формирование таблицы уровней корреляции
 train_jsr_corr_lvls = get_corr_levels(
     train_jsr_corr_matrix,
-    train_jsr_corr_mask,
     target=TARGET_JSR
 )
 
@@ -1590,21 +1506,10 @@ train_quit_interval_cols = (
 )
 
 # Настройки матрицы
-train_quit_corr_matrix = (
-    train_quit_cleaned
-    .phik_matrix(interval_cols=train_quit_interval_cols)
-)
-
-train_quit_corr_mask = (
-    np
-    .triu(np.ones(train_quit_corr_matrix.shape),k=1)
-)
+train_quit_corr_matrix = phik_matrix(train_quit_cleaned, interval_cols=train_quit_interval_cols)
 
 # Отображение матрицы
-show_corr_heatmap_plot(
-    train_quit_corr_matrix,
-    train_quit_corr_mask
-)
+show_corr_heatmap_plot(train_quit_corr_matrix)
 
 
 # In[56]:
@@ -1613,7 +1518,6 @@ show_corr_heatmap_plot(
 # Формирование таблицы уровней корреляции
 train_quit_corr_lvls = get_corr_levels(
     train_quit_corr_matrix,
-    train_quit_corr_mask,
     target=TARGET_QUIT
 )
 
@@ -1752,31 +1656,6 @@ show_hist_kde_plot(
 # ### Подготовка методов для ML-моделей
 # ___
 
-# In[62]:
-
-
-def smape_score(y_true, y_pred):
-    '''
-    Вычисляет симметричную среднюю абсолютную процентную ошибку (SMAPE) между истинными и предсказанными значениями
-
-    SMAPE (Symmetric Mean Absolute Percentage Error) — это показатель качества регрессионных моделей,
-    измеряющий среднее значение относительной ошибки между предсказанными и реальными значениями,
-    выраженное в процентах. Формула SMAPE симметрична и устойчива к нулевым значениям
-
-    Формула: SMAPE = mean( |y_pred - y_true| / ((|y_true| + |y_pred|) / 2) ) * 100
-    '''
-    
-    epsilon = 1e-12  # Защита от деления на ноль
-    numerator = np.abs(y_pred - y_true)
-    denominator = (np.abs(y_true) + np.abs(y_pred) + epsilon) / 2
-    smape_result = np.mean(numerator / denominator) * 100
-    
-    return smape_result
-
-# Инициализация оценщика SMAPE
-smape_scorer = make_scorer(smape_score, greater_is_better=False)
-
-
 # In[63]:
 
 
@@ -1793,218 +1672,6 @@ def get_samples_shape_info(X_train, X_test, y_train, y_test):
     display(result)
 
 
-# In[64]:
-
-
-def build_pipeline(task,
-                   ohe_columns,
-                   ord_columns,
-                   num_columns,
-                   ord_categories,
-                   model=None,
-                   num_scaler=None,
-                   poly_degree=None):
-    
-    if model is None:
-        if task == 'reg':
-            model = DecisionTreeRegressor(random_state=RANDOM_STATE)
-        elif task == 'clf':
-            model = DecisionTreeClassifier(random_state=RANDOM_STATE)
-        
-    ohe_pipe = Pipeline([
-        ('imputer_ohe', SimpleImputer(missing_values=np.nan, strategy='most_frequent')),
-        ('ohe', OneHotEncoder(drop='first', handle_unknown='ignore', sparse_output=False))
-    ])
-    
-    ord_pipe = Pipeline([
-        ('imputer_before_ord', SimpleImputer(missing_values=np.nan, strategy='most_frequent')),
-        ('ord', OrdinalEncoder(categories=ord_categories, handle_unknown='use_encoded_value', unknown_value=-1)),
-        ('imputer_after_ord', SimpleImputer(missing_values=np.nan, strategy='most_frequent'))
-    ])
-    
-    if poly_degree is None or poly_degree == 1:
-        num_pipe = Pipeline([
-            ('scaler', num_scaler)
-        ])
-    else:
-        num_pipe = Pipeline([
-            ('scaler', num_scaler),
-            ('poly', PolynomialFeatures(degree=poly_degree))
-        ])
-        
-    preprocessor = ColumnTransformer([
-        ('ohe', ohe_pipe, ohe_columns),
-        ('ord', ord_pipe, ord_columns),
-        ('num', num_pipe, num_columns)
-    ], remainder='passthrough')
-    
-    pipeline = Pipeline([
-        ('preprocessor', preprocessor),
-        ('model', model)
-    ])
-    
-    return pipeline
-
-
-# In[65]:
-
-
-def construct_param_grid_sklearn(task, preprocessor_num=None):
-    if preprocessor_num is None:
-        preprocessor_num = [StandardScaler(), MinMaxScaler(), RobustScaler(), 'passthrough']
-
-    if task == 'reg':
-        return [
-            {
-                'model': [DecisionTreeRegressor(random_state=RANDOM_STATE)],
-                'model__max_depth': np.arange(2, 5),
-                'model__max_features': np.arange(2, 5),
-                'preprocessor__num__scaler': preprocessor_num
-            },
-            {
-                'model': [KNeighborsRegressor()],
-                'model__n_neighbors': np.arange(2, 8),
-                'preprocessor__num__scaler': preprocessor_num
-            },
-            {
-                'model': [SVR()],
-                'model__C': [0.1, 1, 10],
-                'preprocessor__num__scaler': preprocessor_num
-            },
-            {
-                'model': [LinearRegression()],
-                'model__fit_intercept': [True, False],
-                'preprocessor__num__scaler': preprocessor_num
-            }
-        ]
-    elif task == 'clf':
-        return [
-            {
-                'model': [LogisticRegression(class_weight='balanced', solver='liblinear', penalty='l1', random_state=RANDOM_STATE)],
-                'model__C': np.arange(2, 11),
-                'preprocessor__num__scaler': preprocessor_num
-            },
-            {
-                'model': [DecisionTreeClassifier(class_weight='balanced', random_state=RANDOM_STATE)],
-                'model__max_depth': np.arange(1, 6),
-                'model__max_features': np.arange(1, 6),
-                'preprocessor__num__scaler': preprocessor_num
-            },
-            {
-                'model': [KNeighborsClassifier(n_neighbors=7)],
-                'model__n_neighbors': np.arange(2, 11),
-                'preprocessor__num__scaler': preprocessor_num
-            },
-            {
-                'model': [SVC(class_weight='balanced', probability=True, random_state=RANDOM_STATE)],
-                'model__C': [0.001, 0.01, 0.1, 1, 10, 100],
-                'model__kernel': ['linear', 'rbf'],
-                'model__gamma': ['scale', 'auto'],
-                'preprocessor__num__scaler': preprocessor_num
-            }
-        ]
-    else:
-        return display(Markdown(f'Некорректное значение task: "{task}". Доступны "`reg`" и "`clf`".'))
-
-
-# In[66]:
-
-
-def construct_param_grid_optuna(task, preprocessor_num=None):
-    if preprocessor_num is None:
-        preprocessor_num = [StandardScaler(), MinMaxScaler(), RobustScaler(), 'passthrough']
-        
-    if task == 'reg':
-        return {
-            'knn': {
-                'model': CategoricalDistribution([KNeighborsRegressor()]),
-                'model__n_neighbors': IntDistribution(2, 7),
-                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
-            },
-            'decision_tree': {
-                'model': CategoricalDistribution([DecisionTreeRegressor(random_state=RANDOM_STATE)]),
-                'model__max_depth': IntDistribution(2, 7),
-                'model__min_samples_split': IntDistribution(2, 5),
-                'model__min_samples_leaf': IntDistribution(2, 5),
-                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
-            },
-            'linreg': {
-                'model': CategoricalDistribution([LinearRegression()]),
-                'model__fit_intercept': CategoricalDistribution([True, False]),
-                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
-            },
-            'svr': {
-                'model': CategoricalDistribution([SVR()]),
-                'model__kernel': CategoricalDistribution(['rbf', 'sigmoid', 'poly']),
-                'model__C': FloatDistribution(0.01, 10, log=True),
-                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
-            }
-        }
-    elif task == 'clf':
-        return {
-            'knn': {
-                'model': CategoricalDistribution([KNeighborsClassifier()]),
-                'model__n_neighbors': IntDistribution(2, 7),
-                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
-            },
-            'decision_tree': {
-                'model': CategoricalDistribution([DecisionTreeClassifier(class_weight='balanced', random_state=RANDOM_STATE)]),
-                'model__max_depth': IntDistribution(2, 7),
-                'model__min_samples_split': IntDistribution(2, 5),
-                'model__min_samples_leaf': IntDistribution(2, 5),
-                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
-            },
-            'logreg': {
-                'model': CategoricalDistribution([LogisticRegression(class_weight='balanced', random_state=RANDOM_STATE)]),
-                'model__C': FloatDistribution(0.01, 10, log=True),
-                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
-            },
-            'svc': {
-                'model': CategoricalDistribution([SVC(class_weight='balanced', probability=True, random_state=RANDOM_STATE)]),
-                'model__kernel': CategoricalDistribution(['rbf', 'sigmoid', 'poly']),
-                'model__C': FloatDistribution(0.01, 10, log=True),
-                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
-            }
-        }
-    else:
-        return display(Markdown(f'Некорректное значение task: "{task}". Доступны "`reg`" и "`clf`".'))
-
-
-# In[67]:
-
-
-def get_searcher(final_pipeline,
-                 param_grid,
-                 search_method,
-                 scoring=None,
-                 cv=None):
-    
-    if search_method == 'randomized':
-        return RandomizedSearchCV(
-            final_pipeline,
-            param_grid,
-            scoring=scoring,
-            n_iter=20,
-            n_jobs=1,
-            verbose=0,
-            cv=cv,
-            random_state=RANDOM_STATE,
-        )
-        
-    if search_method == 'optuna':
-        return OptunaSearchCV(
-            final_pipeline,
-            param_grid,
-            cv=cv,
-            scoring=scoring,
-            n_trials=40,
-            n_jobs=1,
-            verbose=1,
-            error_score='raise',
-            random_state=RANDOM_STATE
-        )
-
-
 # In[68]:
 
 
@@ -2123,6 +1790,44 @@ def show_shap(shap_values):
     plt.show()
 
 
+# In[ ]:
+
+
+def compare_kernel_approx(best_pipeline, task, X_train, y_train, X_test, y_test, scoring):
+    # Точная SVM строится заново с gamma и C лучшей модели: победителем поиска
+    # может быть и само приближение ядра. Для моделей без RBF-ядра - ValueError
+    X_train_preprocessed = clone(best_pipeline.named_steps.preprocessor).fit_transform(X_train)
+    gamma, C = get_rbf_params(best_pipeline.named_steps.model, X_train_preprocessed)
+    
+    models = {
+        'Exact': build_exact_svm_model(task, gamma, C),
+        'Nystroem': build_kernel_approx_model(task, 'nystroem').set_params(kernel__gamma=gamma, linear__C=C),
+        'RFF': build_kernel_approx_model(task, 'rff').set_params(kernel__gamma=gamma, linear__C=C),
+    }
+    
+    results = []
+    
+    for name, model in models.items():
+        pipeline = clone(best_pipeline).set_params(memory=None, model=model)
+        
+        start = time.perf_counter()
+        pipeline.fit(X_train, y_train)
+        fit_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        score = check_scoring(pipeline, scoring=scoring)(pipeline, X_test, y_test)
+        pred_time = time.perf_counter() - start
+        
+        results.append({
+            'Модель': name,
+            'Метрика (тест)': np.abs(score),
+            'Train Time (sec.)': fit_time,
+            'Pred Time (sec.)': pred_time,
+        })
+    
+    return pd.DataFrame(results).set_index('Модель')
+
+
 # ### Предсказание уровня удовлетворенности сотрудников
 # ___
 
@@ -2169,12 +1874,18 @@ ord_categories = [
     list(X_train_jsr.workload.unique()),
 ]
 
+# Кэш препроцессоров на диске, ключ - хэш данных фолда и параметров препроцессора.
+# Размер ограничен CACHE_BYTES_LIMIT при каждой записи, в том числе во время поиска:
+# вытесняются давно не использованные препроцессоры
+transformer_cache = BoundedMemory(location=CACHE_DIR, bytes_limit=CACHE_BYTES_LIMIT, verbose=0)
+
 pipeline_params_jsr = {
     'task': 'reg',
     'ohe_columns': ohe_columns,
     'ord_columns': ord_columns,
     'num_columns': num_columns,
     'ord_categories': ord_categories,
+    'memory': transformer_cache,
 }
 
 final_pipeline_jsr = build_pipeline(**pipeline_params_jsr)
@@ -2198,81 +1909,55 @@ cv = KFold(n_splits=5, shuffle=True, random_state=RANDOM_STATE)
 # Поиск лучшей модели через RandomizedSearch
 randomized_param_grid_jsr = construct_param_grid_sklearn('reg')
 
-rs_results_list = []
-rs_best_pipeline_jsr = None
-rs_best_pipeline_jsr_name = None
-rs_best_pipeline_cv_score_jsr = float('-inf')
-
-for param_dist in tqdm(randomized_param_grid_jsr, desc='RSCV Progress'):    
-    rs_searcher = get_searcher(
-        final_pipeline_jsr,
-        param_dist,
-        search_method='randomized',
-        scoring=smape_scorer,
-        cv=cv
-    )
-    
-    with tqdm(total=1, desc=f'{param_dist["model"][0].__class__.__name__}') as pbar:
-        rs_searcher.fit(X_train_jsr, y_train_jsr)
-        
-        pbar.update(1)
-        pbar.set_postfix({'Best CV': f'{rs_searcher.best_score_:.4f}'})
-            
-    cv_score = rs_searcher.best_score_
-    
-    rs_results_list.append({
-        'Best Model': rs_searcher.best_estimator_.named_steps.model,
-        'Best CV': f'{cv_score:.4f}',
-        'Train Time (sec.)': f'{rs_searcher.refit_time_:.2f}',
-        'Pred Time (sec.)': f'{rs_searcher.cv_results_["mean_score_time"][rs_searcher.best_index_]:.2f}',
-        'Method': 'RSVC'
-    })
-    
-    if cv_score > rs_best_pipeline_cv_score_jsr:
-        rs_best_pipeline_jsr = rs_searcher.best_estimator_
-        rs_best_pipeline_cv_score_jsr = cv_score
+rs_results_list, rs_best_pipeline_jsr, rs_best_pipeline_cv_score_jsr = run_search(
+    final_pipeline_jsr,
+    randomized_param_grid_jsr,
+    search_method='randomized',
+    X=X_train_jsr,
+    y=y_train_jsr,
+    scoring=smape_scorer,
+    cv=cv,
+    n_jobs=N_JOBS,
+    random_state=RANDOM_STATE
+)
 
 
 # In[76]:
 
 
 # Поиск лучшей модели через Optuna Search
-os_results_list = []
-optuna_best_pipeline_jsr = None
-optuna_best_pipeline_jsr_name = None
-optuna_best_pipeline_cv_score_jsr = float('-inf')
-
 optuna_param_grid_jsr = construct_param_grid_optuna('reg')
 
-for model_key, dist in tqdm(optuna_param_grid_jsr.items(), 'OSCV Progress'):            
-    optuna_searcher = get_searcher(
-        final_pipeline_jsr,
-        dist,
-        search_method='optuna',
-        scoring=smape_scorer,
-        cv=cv
-    )
-    
-    with tqdm(total=1, desc=f'{dist["model"].choices[0].__class__.__name__}') as pbar:
-        optuna_searcher.fit(X_train_jsr, y_train_jsr)
-        
-        pbar.update(1)
-        pbar.set_postfix({'Best CV ': f'{optuna_searcher.best_score_:.4f}'})
-    
-    cv_score = optuna_searcher.best_score_
-    os_best_model_name = optuna_searcher.best_estimator_.named_steps.model.__class__.__name__
-    
-    os_results_list.append({
-        'Best Model': f'{optuna_searcher.best_estimator_.named_steps.model}',
-        'Best CV': f'{cv_score:.4f}',
-        'Train Time (sec.)': f'{optuna_searcher.refit_time_:.2f}',
-        'Pred Time (sec.)': f'{optuna_searcher.cv_results_["mean_score_time"][optuna_searcher.best_index_]:.2f}',
-        'Method': 'OSCV'
-    })
-    
-    if cv_score > optuna_best_pipeline_cv_score_jsr:
-        optuna_best_pipeline_jsr = optuna_searcher.best_estimator_
-        optuna_best_pipeline_cv_score_jsr = cv_score
+os_results_list, optuna_best_pipeline_jsr, optuna_best_pipeline_cv_score_jsr = run_search(
+    final_pipeline_jsr,
+    optuna_param_grid_jsr,
+    search_method='optuna',
+    X=X_train_jsr,
+    y=y_train_jsr,
+    scoring=smape_scorer,
+    cv=cv,
+    n_jobs=N_JOBS,
+    random_state=RANDOM_STATE
+)
+
+
+# In[ ]:
+
+
+# Поиск лучшей модели через Successive Halving:
+# кандидаты отсеиваются на малых подвыборках, поэтому их можно проверить в 10 раз больше
+hs_results_list, hs_best_pipeline_jsr, hs_best_pipeline_cv_score_jsr = run_search(
+    final_pipeline_jsr,
+    randomized_param_grid_jsr,
+    search_method='halving',
+    X=X_train_jsr,
+    y=y_train_jsr,
+    scoring=smape_scorer,
+    cv=cv,
+    n_iter=200,
+    n_jobs=N_JOBS,
+    random_state=RANDOM_STATE
+)
 
 
 # In[77]:
@@ -2281,7 +1966,8 @@ for model_key, dist in tqdm(optuna_param_grid_jsr.items(), 'OSCV Progress'):
 # Вывод результатов обучения моделей
 jsr_full_results_list = pd.concat([
     pd.DataFrame(rs_results_list),
-    pd.DataFrame(os_results_list)
+    pd.DataFrame(os_results_list),
+    pd.DataFrame(hs_results_list)
 ]).sort_values('Best CV', ).reset_index(drop=True)
 
 jsr_full_results_list.style.background_gradient(cmap=PALETTE_NUMERIC, subset=['Best CV'])
@@ -2318,24 +2004,41 @@ display(optuna_best_pipeline_jsr.named_steps.model)
 display(pd.DataFrame(best_model_metrics).T)
 
 
+# In[ ]:
+
+
+# Сравнение точной SVM с приближением ядра (Nystroem и RFF + линейная SVM):
+# метрика на тесте должна совпадать, а время обучения - расти линейно по строкам
+compare_kernel_approx(
+    optuna_best_pipeline_jsr,
+    'reg',
+    X_train_jsr,
+    y_train_jsr,
+    X_test_jsr,
+    y_test_jsr,
+    smape_scorer
+)
+
+
 # #### Анализ важности признаков
 
 # In[79]:
 
 
 # Определение пермутационной важности признаков
-best_estimator_jsr = optuna_searcher.best_estimator_.named_steps
+best_estimator_jsr = optuna_best_pipeline_jsr.named_steps
 best_model_jsr = best_estimator_jsr.model
 best_model_preprocessor_jsr = best_estimator_jsr.preprocessor
 best_model_feature_names_jsr = best_model_preprocessor_jsr.get_feature_names_out()
 X_test_jsr_preprocessor = best_model_preprocessor_jsr.transform(X_test_jsr)
 
-permutation_result_jsr = permutation_importance(
-    best_model_jsr, 
-    X_test_jsr_preprocessor,
+# Важность исходных столбцов: препроцессор применяется один раз, переставляются его выходные столбцы
+permutation_result_jsr = pipeline_permutation_importance(
+    optuna_best_pipeline_jsr,
+    X_test_jsr,
     y_test_jsr,
     scoring=smape_scorer,
-    n_repeats=10
+    random_state=RANDOM_STATE
 )
 
 
@@ -2344,7 +2047,7 @@ permutation_result_jsr = permutation_importance(
 
 # Визуализация и вывод информации
 feature_importance_jsr = pd.DataFrame({
-    'name': best_model_feature_names_jsr,
+    'name': permutation_result_jsr.feature_names,
     'value': permutation_result_jsr.importances_mean,
     })
 
@@ -2360,13 +2063,13 @@ shap_data_jsr = pd.DataFrame(
     columns=best_model_feature_names_jsr
 )
 
-explainer_jsr = shap.Explainer(
-    best_model_jsr.predict,
-    shap.sample(shap_data_jsr, 150, random_state=RANDOM_STATE),
+shap_values_jsr = explain_model(
+    best_model_jsr,
+    shap_data_jsr[:150],
+    background=shap.sample(shap_data_jsr, 150, random_state=RANDOM_STATE),
+    random_state=RANDOM_STATE
 )
 
-shap_values_jsr = explainer_jsr(shap_data_jsr[:150])
-
 
 # In[82]:
 
@@ -2388,12 +2091,12 @@ show_shap(shap_values_jsr)
 # >- **Далее анализ будет проводиться на основе модели SVR Optuna Search**
 # 
 # **Анализ Feature Importance**
-# > - Согласно анализу важности признаков, можно выделить 4 самых наиболее важных признака:
-# >    - **`num__salary`**
-# >    - **`num__supervisor_evaluation`**
-# >    - **`ord__level`**
-# >    - **`ord__workload`**
-# > - Также можно отметить, что сотрудники из отдела Технологий имею тнаиболее высокие показатели удовлетворенности
+# > - Согласно анализу важности исходных признаков (рост SMAPE при перестановке столбца), можно выделить 4 самых наиболее важных признака:
+# >    - **`salary`** (~43)
+# >    - **`level`** (~33)
+# >    - **`workload`** (~26)
+# >    - **`supervisor_evaluation`** (~25)
+# > - Заметно меньше влияют длительность работы `employment_years` (~11) и отдел `dept` (~7), вклад нарушений и повышений минимален
 # 
 # **Анализ SHAP**
 # > **Самые важные признаки**
@@ -2462,21 +2165,10 @@ test_data_quit_interval_cols = (
 )
 
 # Настройки матрицы
-test_data_quit_corr_matrix = (
-    test_data_quit
-    .phik_matrix(interval_cols=test_data_quit_interval_cols)
-)
-
-test_data_quit_corr_mask = np.triu(
-    np.ones(test_data_quit_corr_matrix.shape),
-    k=1
-)
+test_data_quit_corr_matrix = phik_matrix(test_data_quit, interval_cols=test_data_quit_interval_cols)
 
 # Отображение матрицы
-show_corr_heatmap_plot(
-    test_data_quit_corr_matrix,
-    test_data_quit_corr_mask
-)
+show_corr_heatmap_plot(test_data_quit_corr_matrix)
 
 
 # ##### Тренировачная выборка `train_data_quit`
@@ -2494,21 +2186,10 @@ train_data_quit_interval_cols = (
 )
 
 # Настройки матрицы
-train_data_quit_corr_matrix = (
-    train_data_quit
-    .phik_matrix(interval_cols=train_data_quit_interval_cols)
-)
-
-train_data_quit_corr_mask = np.triu(
-    np.ones(train_data_quit_corr_matrix.shape),
-    k=1
-)
+train_data_quit_corr_matrix = phik_matrix(train_data_quit, interval_cols=train_data_quit_interval_cols)
 
 # Отображение матрицы
-show_corr_heatmap_plot(
-    train_data_quit_corr_matrix,
-    train_data_quit_corr_mask
-)
+show_corr_heatmap_plot(train_data_quit_corr_matrix)
 
 
 # In[86]:
@@ -2548,6 +2229,7 @@ pipeline_params_quit = {
     'ord_columns': ord_columns,
     'num_columns': num_columns,
     'ord_categories': ord_categories,
+    'memory': transformer_cache,
 }
 
 final_pipeline_quit = build_pipeline(**pipeline_params_quit)
@@ -2569,86 +2251,57 @@ dummy_quit.fit(X_train_quit, y_train_quit)
 # Поиск лучшей модели через RandomizedSearch
 randomized_param_grid_quit = construct_param_grid_sklearn('clf')
 
-rs_results_list = []
-rs_best_pipeline_quit = None
-rs_best_pipeline_quit_name = None
-rs_best_pipeline_cv_score_quit = 0
-
 cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=RANDOM_STATE)
 
-for param_dist in tqdm(randomized_param_grid_quit, desc='RSCV Progress'):    
-    rs_searcher = get_searcher(
-        final_pipeline_quit,
-        param_dist,
-        search_method='randomized',
-        scoring='roc_auc',
-        cv=cv
-    )
-
-    with tqdm(total=1, desc=f'{param_dist["model"][0].__class__.__name__}') as pbar:
-        rs_searcher.fit(X_train_quit, y_train_quit)
-        
-        pbar.update(1)
-        pbar.set_postfix({'Best CV': f'{rs_searcher.best_score_:.4f}'})
-            
-    cv_score = rs_searcher.best_score_
-    
-    rs_results_list.append({
-        'Best Model': rs_searcher.best_estimator_.named_steps.model,
-        'Best CV': f'{cv_score:.4f}',
-        'Train Time (sec.)': f'{rs_searcher.refit_time_:.2f}',
-        'Pred Time (sec.)': f'{rs_searcher.cv_results_["mean_score_time"][rs_searcher.best_index_]:.2f}',
-        'Method': 'RSCV'
-
-    })
-    
-    if cv_score > rs_best_pipeline_cv_score_quit:
-        rs_best_pipeline_quit = rs_searcher.best_estimator_
-        rs_best_pipeline_cv_score_quit = cv_score
+rs_results_list, rs_best_pipeline_quit, rs_best_pipeline_cv_score_quit = run_search(
+    final_pipeline_quit,
+    randomized_param_grid_quit,
+    search_method='randomized',
+    X=X_train_quit,
+    y=y_train_quit,
+    scoring='roc_auc',
+    cv=cv,
+    n_jobs=N_JOBS,
+    random_state=RANDOM_STATE
+)
 
 
 # In[91]:
 
 
 # Поиск лучшей модели через Optuna Search
-os_results_list = []
-optuna_best_pipeline_quit = None
-optuna_best_pipeline_quit_name = None
-optuna_best_pipeline_cv_score_quit = 0
-
 optuna_param_grid_quit = construct_param_grid_optuna('clf')
 
-for model_key, dist in tqdm(optuna_param_grid_quit.items(), 'OSCV Progress'):
-    model_name = dist['model'].choices[0].__class__.__name__
-            
-    optuna_searcher = get_searcher(
-        final_pipeline_quit,
-        dist,
-        search_method='optuna',
-        scoring='roc_auc',
-        cv=cv
-    )
-    
-    with tqdm(total=1, desc=f'{model_name}') as pbar:
-        optuna_searcher.fit(X_train_quit, y_train_quit)
-        
-        pbar.update(1)
-        pbar.set_postfix({'Best CV': f'{optuna_searcher.best_score_:.4f}'})
-    
-    cv_score = optuna_searcher.best_score_
-    os_best_model_name = optuna_searcher.best_estimator_.named_steps.model.__class__.__name__
-    
-    os_results_list.append({
-        'Best Model': f'{optuna_searcher.best_estimator_.named_steps.model}',
-        'Best CV': f'{cv_score:.4f}',
-        'Train Time (sec.)': f'{optuna_searcher.refit_time_:.2f}',
-        'Pred Time (sec.)': f'{optuna_searcher.cv_results_["mean_score_time"][optuna_searcher.best_index_]:.2f}',
-        'Method': 'OSCV'
-    })
-    
-    if cv_score > optuna_best_pipeline_cv_score_quit:
-        optuna_best_pipeline_quit = optuna_searcher.best_estimator_
-        optuna_best_pipeline_cv_score_quit = cv_score
+os_results_list, optuna_best_pipeline_quit, optuna_best_pipeline_cv_score_quit = run_search(
+    final_pipeline_quit,
+    optuna_param_grid_quit,
+    search_method='optuna',
+    X=X_train_quit,
+    y=y_train_quit,
+    scoring='roc_auc',
+    cv=cv,
+    n_jobs=N_JOBS,
+    random_state=RANDOM_STATE
+)
+
+
+# In[ ]:
+
+
+# Поиск лучшей модели через Successive Halving:
+# кандидаты отсеиваются на малых подвыборках, поэтому их можно проверить в 10 раз больше
+hs_results_list, hs_best_pipeline_quit, hs_best_pipeline_cv_score_quit = run_search(
+    final_pipeline_quit,
+    randomized_param_grid_quit,
+    search_method='halving',
+    X=X_train_quit,
+    y=y_train_quit,
+    scoring='roc_auc',
+    cv=cv,
+    n_iter=200,
+    n_jobs=N_JOBS,
+    random_state=RANDOM_STATE
+)
 
 
 # In[92]:
@@ -2657,12 +2310,27 @@ for model_key, dist in tqdm(optuna_param_grid_quit.items(), 'OSCV Progress'):
 # Вывод результатов обучения моделей
 quit_full_results_list = pd.concat([
     pd.DataFrame(rs_results_list),
-    pd.DataFrame(os_results_list)
+    pd.DataFrame(os_results_list),
+    pd.DataFrame(hs_results_list)
 ]).sort_values('Best CV', ascending=False).reset_index(drop=True)
 
 quit_full_results_list.style.background_gradient(cmap=PALETTE_NUMERIC, subset=['Best CV'])
 
 
+# In[ ]:
+
+
+# SVC в поиске обучается без probability=True и оценивается по decision_function,
+# поэтому вероятности калибруются один раз - только для финальной модели
+rs_best_pipeline_quit = calibrate_pipeline(
+    rs_best_pipeline_quit,
+    X_train_quit,
+    y_train_quit,
+    method='sigmoid',
+    cv=cv
+)
+
+
 # In[93]:
 
 
@@ -2694,6 +2362,22 @@ display(rs_best_pipeline_quit.named_steps.model)
 display(pd.DataFrame(best_model_metrics).T)
 
 
+# In[ ]:
+
+
+# Сравнение точной SVM с приближением ядра (Nystroem и RFF + линейная SVM):
+# метрика на тесте должна совпадать, а время обучения - расти линейно по строкам
+compare_kernel_approx(
+    rs_best_pipeline_quit,
+    'clf',
+    X_train_quit,
+    y_train_quit,
+    X_test_quit,
+    y_test_quit,
+    'roc_auc'
+)
+
+
 # #### Анализ важности признаков
 
 # In[94]:
@@ -2705,12 +2389,12 @@ best_model_preprocessor_quit = rs_best_pipeline_quit.named_steps.preprocessor
 best_model_feature_names_quit = best_model_preprocessor_quit.get_feature_names_out()
 X_test_quit_preprocessor = best_model_preprocessor_quit.transform(X_test_quit)
 
-permutation_result_quit = permutation_importance(
-    best_model_quit,
-    X_test_quit_preprocessor,
+permutation_result_quit = pipeline_permutation_importance(
+    rs_best_pipeline_quit,
+    X_test_quit,
     y_test_quit,
     scoring='roc_auc',
-    n_repeats=10
+    random_state=RANDOM_STATE
 )
 
 
@@ -2719,7 +2403,7 @@ permutation_result_quit = permutation_importance(
 
 # Визуализация и вывод информации
 feature_importance_quit = pd.DataFrame({
-    'name': best_model_feature_names_quit,
+    'name': permutation_result_quit.feature_names,
     'value': permutation_result_quit.importances_mean,
     })
 
@@ -2735,13 +2419,13 @@ quit_data = pd.DataFrame(
     columns=best_model_feature_names_quit
 )
                     
-explainer_quit = shap.Explainer(
-    best_model_quit.predict_proba,
-    shap.sample(quit_data, 150, random_state=RANDOM_STATE)
+shap_values_quit = explain_model(
+    best_model_quit,
+    quit_data[:150],
+    background=shap.sample(quit_data, 150, random_state=RANDOM_STATE),
+    random_state=RANDOM_STATE
 )
 
-shap_values_quit = explainer_quit(quit_data[:150])
-
 
 # In[97]:
 
@@ -2764,12 +2448,12 @@ show_shap(shap_values_quit[..., 1])
 # >- **Далее анализ будет проводиться на основе модели SVС Randomized Search**
 # 
 # **Анализ Feature Importance**
-# > - Согласно анализу важности признаков, можно выделить 4 самых наиболее влиятелных признака:
-# > > - **`ord__level`**
-# > > - **`remainder__jsr_predict`**
-# > > - **`num__employment_years`**
-# > > - **`ord__workload`**
-# > - Также можно отметить, что сотрудники из отдела Технологий и Продаж более многочисленны по вероятностям Увольнения
+# > - Согласно анализу важности исходных признаков (падение ROC-AUC при перестановке столбца), можно выделить 4 самых наиболее влиятелных признака:
+# > > - **`level`** (~0.13)
+# > > - **`jsr_predict`** (~0.10)
+# > > - **`employment_years`** (~0.04)
+# > > - **`workload`** (~0.03)
+# > - Перестановка отдела `dept` и зарплаты `salary` метрику не снижает (важность в пределах шума), вклад оценки руководителя, нарушений и повышений близок к нулю
 # 
 # **Анализ SHAP**
 # > **Самые важные признаки**
@@ -2797,6 +2481,55 @@ show_shap(shap_values_quit[..., 1])
 # >
 # > Другие признаки имеют меньшее, часто незначительное влияние
 
+# ### Сохранение моделей
+# ___
+
+# In[ ]:
+
+
+# Сохранение лучших пайплайнов в артефакт для скоринга вне ноутбука:
+# python -m hr_analytics score test_features.csv scores.csv
+artifacts_manifest = save_artifacts(
+    'models',
+    optuna_best_pipeline_jsr,
+    rs_best_pipeline_quit,
+    metadata={
+        'jsr_model': f'{optuna_best_pipeline_jsr.named_steps.model}',
+        'jsr_cv_smape': np.abs(optuna_best_pipeline_cv_score_jsr),
+        'quit_model': f'{rs_best_pipeline_quit.named_steps.model}',
+        'quit_cv_roc_auc': rs_best_pipeline_cv_score_quit,
+    }
+)
+
+display(artifacts_manifest)
+
+
+# In[ ]:
+
+
+# Скомпилированные препроцессоры (таблицы и векторы NumPy) используются при скоринге
+# и в сервисе. Проверка совпадения выхода с preprocessor.transform на тестовых данных
+# и сравнение задержки на одной строке
+compiled_pipeline_jsr = compile_pipeline(optuna_best_pipeline_jsr, X_test_jsr)
+compiled_pipeline_quit = compile_pipeline(rs_best_pipeline_quit, X_test_quit)
+
+row_jsr = X_test_jsr.iloc[[0]]
+preprocessor_latency = {}
+
+for name, preprocessor in [
+    ('ColumnTransformer', optuna_best_pipeline_jsr.named_steps.preprocessor),
+    ('Compiled', compiled_pipeline_jsr.named_steps.preprocessor)
+]:
+    start = time.perf_counter()
+
+    for _ in range(1000):
+        preprocessor.transform(row_jsr)
+
+    preprocessor_latency[name] = (time.perf_counter() - start) / 1000 * 1e6
+
+display(pd.Series(preprocessor_latency, name='Задержка на строку, мкс'))
+
+
 # ## Отбор и анализ сегмента
 # ___
 
@@ -2850,37 +2583,24 @@ get_df_overview(
 
 
 # Вывод таблицы для наглядности и формирование сегментов для анализа
-def dept_agg(df):
-    return pd.Series({
-        'Сотрудники (всего)': len(df),
-        'Грейд (мода)': df['level'].mode()[0],
-        'Зарплата (медиана)': np.median(df['salary']),
-        'Длительность (ср)': np.round(np.mean(df['employment_years']), 1),
-        'Оценка (мода)': df['supervisor_evaluation'].mode()[0],
-        'Загрузка (мода)': df['workload'].mode()[0],
-        'Повышений (%)': np.round(df['last_year_promo_yes'].mean()*100, 1),
-        'Нарушений (%)': np.round(df['last_year_violations_yes'].mean()*100, 1),
-        'Удовлетворенность (ср)': np.round(df['jsr_predict'].mean(), 2),
-        'Вероятность увольнения (ср)': np.round(df['quit_predict'].mean(), 2),
-    })
-
-high_risk_dept = (
-    high_risk_segment
-    .groupby('dept')
-    .apply(dept_agg)
-    .reset_index()
-    .rename(columns={'dept': 'Отдел'})
+# Оба сегмента считаются одним проходом по segment_data с ключом (сегмент, отдел)
+segment = pd.Series(
+    pd.Categorical(
+        np.where(segment_data.index.isin(high_risk_segment.index), 'Целевой', 'Нецелевой'),
+        categories=['Целевой', 'Нецелевой']
+    ),
+    index=segment_data.index
 )
 
-
-low_risk_dept = (
-    low_risk_segment
-    .groupby('dept')
-    .apply(dept_agg)
+dept_report = (
+    segment_report(segment_data, segment)
+    .rename_axis(['Сегмент', 'Отдел'])
     .reset_index()
-    .rename(columns={'dept': 'Отдел'})
 )
 
+high_risk_dept = dept_report.query('Сегмент == "Целевой"').drop(columns='Сегмент').reset_index(drop=True)
+low_risk_dept = dept_report.query('Сегмент == "Нецелевой"').drop(columns='Сегмент').reset_index(drop=True)
+
 
 # In[100]:
 
@@ -2892,12 +2612,7 @@ display(high_risk_dept, low_risk_dept)
 
 
 # Построение пэирплота для сравнения сегментов
-high_risk_dept['Сегмент'] = 'Целевой'
-low_risk_dept['Сегмент'] = 'Нецелевой'
-
-merged = pd.concat([high_risk_dept, low_risk_dept])
-
-sns.pairplot(merged, hue='Сегмент', corner=True)
+sns.pairplot(dept_report, hue='Сегмент', hue_order=['Целевой', 'Нецелевой'], corner=True)
 plt.tight_layout()
 plt.show()
 
@@ -0,0 +1,3 @@
+'''
+Вспомогательные модули проекта HR-аналитики, используемые ноутбуком `hr-analytics-ml`
+'''
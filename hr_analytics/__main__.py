@@ -0,0 +1,113 @@
+'''
+Точка входа командной строки:
+
+    python -m hr_analytics score test_features.csv scores.csv
+    python -m hr_analytics serve --port 8000
+    python -m hr_analytics generate train_quit.csv train_quit_1m.csv --n-rows 1000000
+    python -m hr_analytics clean train_quit_1m.csv train_quit_1m.parquet
+'''
+
+import argparse
+import time
+
+import pandas as pd
+
+from hr_analytics import cleaning, datagen, scoring, service
+from hr_analytics.artifacts import load_artifacts
+
+
+def score(args):
+    jsr_pipeline, quit_pipeline, _ = load_artifacts(args.models_dir, compiled=True)
+
+    start = time.perf_counter()
+    n_rows = scoring.score_csv(
+        args.input,
+        args.output,
+        jsr_pipeline,
+        quit_pipeline,
+        chunksize=args.chunksize
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f'Оценено строк: {n_rows} за {elapsed:.2f} сек. Результат: {args.output}')
+
+
+def serve(args):
+    service.serve(
+        args.models_dir,
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms
+    )
+
+
+def generate(args):
+    generator = datagen.HRDataGenerator().fit(pd.read_csv(args.source))
+
+    start = time.perf_counter()
+    generator.to_csv(args.output, args.n_rows, chunksize=args.chunksize, random_state=args.seed)
+    elapsed = time.perf_counter() - start
+
+    print(f'Сгенерировано строк: {args.n_rows} за {elapsed:.2f} сек. Результат: {args.output}')
+
+
+def clean(args):
+    start = time.perf_counter()
+    n_rows = cleaning.clean_csv(args.input, args.output, chunksize=args.chunksize)
+    elapsed = time.perf_counter() - start
+
+    print(f'Очищено строк: {n_rows} за {elapsed:.2f} сек. Результат: {args.output}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='hr_analytics')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    score_parser = subparsers.add_parser(
+        'score',
+        help='Оценка удовлетворенности и вероятности увольнения сотрудников из CSV'
+    )
+    score_parser.add_argument('input', help='CSV с признаками сотрудников (схема test_features.csv)')
+    score_parser.add_argument('output', help='CSV для записи jsr_predict, quit_predict и high_risk')
+    score_parser.add_argument('--models-dir', default=scoring.MODELS_DIR, help='Каталог артефакта моделей')
+    score_parser.add_argument('--chunksize', type=int, default=scoring.CHUNKSIZE, help='Кол-во строк в чанке')
+    score_parser.set_defaults(func=score)
+
+    serve_parser = subparsers.add_parser(
+        'serve',
+        help='HTTP-сервис онлайн-скоринга отдельных сотрудников'
+    )
+    serve_parser.add_argument('--models-dir', default=scoring.MODELS_DIR, help='Каталог артефакта моделей')
+    serve_parser.add_argument('--host', default=service.HOST)
+    serve_parser.add_argument('--port', type=int, default=service.PORT)
+    serve_parser.add_argument('--max-batch-size', type=int, default=service.MAX_BATCH_SIZE, help='Макс. записей в микробатче')
+    serve_parser.add_argument('--max-wait-ms', type=float, default=service.MAX_WAIT_MS, help='Макс. ожидание сбора микробатча')
+    serve_parser.set_defaults(func=serve)
+
+    generate_parser = subparsers.add_parser(
+        'generate',
+        help='Генерация синтетического датасета по распределениям исходного CSV'
+    )
+    generate_parser.add_argument('source', help='Исходный CSV (например, train_quit.csv)')
+    generate_parser.add_argument('output', help='CSV для записи синтетических данных')
+    generate_parser.add_argument('--n-rows', type=int, required=True, help='Кол-во строк')
+    generate_parser.add_argument('--chunksize', type=int, default=datagen.CHUNKSIZE, help='Кол-во строк в чанке')
+    generate_parser.add_argument('--seed', type=int, default=None, help='Seed генератора')
+    generate_parser.set_defaults(func=generate)
+
+    clean_parser = subparsers.add_parser(
+        'clean',
+        help='Потоковая очистка CSV с записью в Parquet'
+    )
+    clean_parser.add_argument('input', help='CSV в схеме исходных данных')
+    clean_parser.add_argument('output', help='Parquet для записи очищенных данных')
+    clean_parser.add_argument('--chunksize', type=int, default=cleaning.CHUNKSIZE, help='Кол-во строк в чанке')
+    clean_parser.set_defaults(func=clean)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
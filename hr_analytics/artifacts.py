@@ -0,0 +1,111 @@
+'''
+Версионированный формат артефактов обученных моделей
+
+Каталог артефакта содержит manifest.json (версия формата, версии библиотек,
+метаданные обучения) и по одному файлу joblib на пайплайн. Пайплайны
+сохраняются без сжатия, поэтому все массивы NumPy (опорные векторы и двойственные
+коэффициенты SVM, параметры скейлеров и т.д.) лежат в файле как есть и при
+загрузке с mmap_mode='r' отображаются в память, а не копируются. Несколько
+процессов-воркеров, загрузивших один артефакт, разделяют эти страницы
+через кэш ОС только для чтения
+'''
+
+import copy
+import json
+import os
+import warnings
+
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import sklearn
+
+from hr_analytics.compiled import compile_pipeline
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+PIPELINE_FILES = {
+    'jsr': 'jsr_pipeline.joblib',
+    'quit': 'quit_pipeline.joblib',
+}
+
+
+def save_artifacts(path, jsr_pipeline, quit_pipeline, metadata=None):
+    os.makedirs(path, exist_ok=True)
+
+    pipelines = {'jsr': jsr_pipeline, 'quit': quit_pipeline}
+
+    for name, pipeline in pipelines.items():
+        # Кэш препроцессоров нужен только при поиске и не должен попадать в артефакт.
+        # Поверхностная копия: обученные шаги общие, а memory исходного пайплайна не меняется
+        pipeline = copy.copy(pipeline).set_params(memory=None)
+        joblib.dump(pipeline, os.path.join(path, PIPELINE_FILES[name]), compress=0)
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'sklearn_version': sklearn.__version__,
+        'numpy_version': np.__version__,
+        'pipelines': PIPELINE_FILES,
+        'metadata': metadata or {},
+    }
+
+    # Манифест пишется последним и атомарно: недописанный артефакт не будет загружен
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+
+    with open(f'{manifest_path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+
+    os.replace(f'{manifest_path}.tmp', manifest_path)
+
+    return manifest
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if manifest['format_version'] > FORMAT_VERSION:
+        raise ValueError(
+            f'Артефакт {path} сохранен в формате версии {manifest["format_version"]}, '
+            f'поддерживаются версии до {FORMAT_VERSION}'
+        )
+
+    if manifest['sklearn_version'] != sklearn.__version__:
+        warnings.warn(
+            f'Артефакт {path} обучен на scikit-learn {manifest["sklearn_version"]}, '
+            f'установлена версия {sklearn.__version__}'
+        )
+
+    return manifest
+
+
+def load_artifacts(path, mmap_mode='r', compiled=False):
+    '''
+    Загружает оба пайплайна артефакта
+
+    При mmap_mode='r' массивы моделей не читаются с диска целиком, а отображаются
+    в память только для чтения, поэтому холодный старт воркера занимает миллисекунды
+
+    При compiled=True препроцессоры компилируются в таблицы и векторы NumPy
+    (см. hr_analytics.compiled). Если шаг препроцессора не поддерживается,
+    выдается предупреждение и используется исходный пайплайн
+
+    Возвращает пайплайны JSR и quit и манифест
+    '''
+
+    manifest = read_manifest(path)
+
+    jsr_pipeline, quit_pipeline = (
+        joblib.load(os.path.join(path, manifest['pipelines'][name]), mmap_mode=mmap_mode)
+        for name in ('jsr', 'quit')
+    )
+
+    if compiled:
+        try:
+            jsr_pipeline, quit_pipeline = compile_pipeline(jsr_pipeline), compile_pipeline(quit_pipeline)
+        except TypeError as e:
+            warnings.warn(f'Препроцессор артефакта {path} не скомпилирован: {e}')
+
+    return jsr_pipeline, quit_pipeline, manifest
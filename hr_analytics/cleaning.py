@@ -0,0 +1,134 @@
+'''
+Потоковая очистка выгрузок, которые не помещаются в память
+
+CSV читается чанками, к каждому чанку по очереди применяются шаги очистки
+(функции DataFrame -> DataFrame), очищенные чанки дописываются в Parquet по
+мере готовности. Текстовые столбцы читаются как category, поэтому шаги работают
+со словарем категорий, а не с каждой строкой. Память - O(chunksize)
+
+    python -m hr_analytics clean train_quit_1m.csv train_quit_1m.parquet
+'''
+
+import os
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from hr_analytics.data import (
+    FEATURES_SCHEMA,
+    VALUE_TYPOS,
+    apply_schema,
+    get_read_dtypes,
+    rename_values,
+    text_vals_to_nan
+)
+
+CHUNKSIZE = 100_000
+
+# Те же шаги, что и при предобработке в ноутбуке; типы задаются схемой при чтении
+CLEANING_STEPS = [
+    text_vals_to_nan,
+    partial(rename_values, mapping=VALUE_TYPOS),
+]
+
+
+def read_csv_chunks(source, chunksize=CHUNKSIZE, schema=FEATURES_SCHEMA, **params):
+    if schema:
+        params['dtype'] = {**get_read_dtypes(schema), **params.get('dtype', {})}
+
+    with pd.read_csv(source, chunksize=chunksize, **params) as reader:
+        for chunk in reader:
+            yield apply_schema(chunk, schema) if schema else chunk
+
+
+def clean_chunks(chunks, steps=CLEANING_STEPS):
+    for chunk in chunks:
+        for step in steps:
+            chunk = step(chunk)
+
+        yield chunk
+
+
+def get_arrow_schema(chunk, schema=FEATURES_SCHEMA):
+    '''
+    Схема файла Parquet: типы столбцов из schema, индекс и прочие столбцы - по
+    чанку. Категории хранятся словарем строк, как в CSV: тип не зависит от того,
+    пуст ли столбец в первом чанке
+    '''
+
+    inferred = pa.Schema.from_pandas(chunk)
+    fields = []
+
+    for field in inferred:
+        kind = (schema or {}).get(field.name)
+
+        if kind == 'category':
+            field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+        elif kind == 'bool':
+            field = field.with_type(pa.bool_())
+        elif kind is not None:
+            field = field.with_type(pa.from_numpy_dtype(np.dtype(kind)))
+
+        fields.append(field)
+
+    return pa.schema(fields, metadata=inferred.metadata)
+
+
+def categories_to_str(chunk):
+    # Числовые категории (supervisor_evaluation) пишутся строками, при чтении
+    # apply_schema возвращает их к числам
+    for col in chunk.columns:
+        if isinstance(chunk[col].dtype, pd.CategoricalDtype) and chunk[col].cat.categories.dtype != object:
+            chunk[col] = chunk[col].cat.rename_categories(chunk[col].cat.categories.astype(str))
+
+    return chunk
+
+
+def write_parquet(chunks, path, schema=FEATURES_SCHEMA):
+    '''
+    Дописывает чанки в один файл Parquet, каждый чанк - отдельная группа строк
+
+    Схема файла строится по schema, словари категорий у чанков разные. Файл
+    пишется во временный и переименовывается в path только после последнего
+    чанка: при ошибке недописанный файл не остается
+
+    Возвращает кол-во записанных строк
+    '''
+
+    tmp_path = f'{path}.tmp'
+    writer = None
+    n_rows = 0
+
+    try:
+        for chunk in chunks:
+            chunk = categories_to_str(chunk)
+
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, get_arrow_schema(chunk, schema))
+
+            writer.write_table(pa.Table.from_pandas(chunk, schema=writer.schema))
+            n_rows += len(chunk)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+            os.remove(tmp_path)
+
+        raise
+
+    if writer is None:
+        return n_rows
+
+    writer.close()
+    os.replace(tmp_path, path)
+
+    return n_rows
+
+
+def clean_csv(source, output, steps=CLEANING_STEPS, chunksize=CHUNKSIZE, schema=FEATURES_SCHEMA, **read_params):
+    read_params = {'index_col': 'id', **read_params}
+    chunks = read_csv_chunks(source, chunksize, schema, **read_params)
+
+    return write_parquet(clean_chunks(chunks, steps), output, schema)
@@ -0,0 +1,285 @@
+'''
+Компиляция обученного препроцессора (ColumnTransformer из build_pipeline) для инференса
+
+Импьютеры, энкодеры и скейлеры заменяются плоскими таблицами: значения заполнения
+пропусков, словари категория -> индекс выходного столбца, векторы сдвига и
+масштаба, степени полиномиальных признаков. Скомпилированный препроцессор работает
+напрямую с массивами NumPy без проверок и конвертаций sklearn на каждом вызове
+и выполняет те же арифметические операции в том же порядке, поэтому его выход
+совпадает с preprocessor.transform
+'''
+
+import numpy as np
+import pandas as pd
+
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import (
+    FunctionTransformer,
+    MaxAbsScaler,
+    MinMaxScaler,
+    OneHotEncoder,
+    OrdinalEncoder,
+    PolynomialFeatures,
+    RobustScaler,
+    StandardScaler
+)
+from sklearn.utils import Bunch
+
+
+class _Impute:
+    def __init__(self, imputer):
+        if imputer.add_indicator or not pd.isna(imputer.missing_values):
+            raise TypeError('Поддерживаются только SimpleImputer(missing_values=np.nan) без add_indicator')
+
+        self.fill_values = imputer.statistics_
+
+    def __call__(self, X):
+        mask = pd.isna(X)
+
+        if mask.any():
+            X = np.where(mask, self.fill_values, X)
+
+        return X
+
+
+class _OneHot:
+    def __init__(self, encoder):
+        if encoder.sparse_output or encoder._infrequent_enabled:
+            raise TypeError('Поддерживается только OneHotEncoder(sparse_output=False) без редких категорий')
+
+        if encoder.handle_unknown == 'error':
+            raise TypeError('Поддерживается только OneHotEncoder(handle_unknown="ignore")')
+
+        # Для каждого признака: категория -> номер выходного столбца (-1 для отброшенной)
+        self.lookups = []
+        self.n_output = 0
+
+        for i, categories in enumerate(encoder.categories_):
+            columns = np.arange(len(categories))
+            drop_idx = None if encoder.drop_idx_ is None else encoder.drop_idx_[i]
+
+            if drop_idx is not None:
+                columns = np.where(columns < drop_idx, columns, columns - 1)
+                columns[drop_idx] = -1
+
+            self.lookups.append((pd.Index(categories), np.where(columns >= 0, columns + self.n_output, -1)))
+            self.n_output += len(categories) - (drop_idx is not None)
+
+    def __call__(self, X):
+        result = np.zeros((len(X), self.n_output))
+        rows = np.arange(len(X))
+
+        for i, (categories, columns) in enumerate(self.lookups):
+            codes = categories.get_indexer(X[:, i])
+            # Неизвестная категория, как и отброшенная, кодируется нулями
+            output = np.where(codes >= 0, columns[codes], -1)
+            known = output >= 0
+            result[rows[known], output[known]] = 1
+
+        return result
+
+
+class _Ordinal:
+    def __init__(self, encoder):
+        if encoder._infrequent_enabled:
+            raise TypeError('OrdinalEncoder с редкими категориями не поддерживается')
+
+        self.categories = [pd.Index(categories) for categories in encoder.categories_]
+        self.handle_unknown = encoder.handle_unknown
+        self.unknown_value = encoder.unknown_value
+        self.encoded_missing_value = encoder.encoded_missing_value
+
+    def __call__(self, X):
+        result = np.empty(X.shape)
+
+        for i, categories in enumerate(self.categories):
+            codes = categories.get_indexer(X[:, i])
+
+            if self.handle_unknown == 'error' and (codes < 0).any():
+                raise ValueError(f'Неизвестные категории в столбце {i}: {set(X[codes < 0, i])}')
+
+            result[:, i] = np.where(codes >= 0, codes, self.unknown_value)
+
+            # Пропуск, встреченный при обучении, кодируется encoded_missing_value
+            if categories.hasnans:
+                result[pd.isna(X[:, i]), i] = self.encoded_missing_value
+
+        return result
+
+
+class _Affine:
+    def __init__(self, sub=None, div=None, mul=None, add=None, clip=None):
+        self.sub = sub
+        self.div = div
+        self.mul = mul
+        self.add = add
+        self.clip = clip
+
+    @classmethod
+    def from_scaler(cls, scaler):
+        if isinstance(scaler, StandardScaler):
+            return cls(
+                sub=scaler.mean_ if scaler.with_mean else None,
+                div=scaler.scale_ if scaler.with_std else None
+            )
+
+        if isinstance(scaler, MinMaxScaler):
+            return cls(mul=scaler.scale_, add=scaler.min_, clip=scaler.feature_range if scaler.clip else None)
+
+        if isinstance(scaler, RobustScaler):
+            return cls(
+                sub=scaler.center_ if scaler.with_centering else None,
+                div=scaler.scale_ if scaler.with_scaling else None
+            )
+
+        if isinstance(scaler, MaxAbsScaler):
+            return cls(div=scaler.scale_)
+
+        raise TypeError(f'Скейлер {type(scaler).__name__} не поддерживается')
+
+    def __call__(self, X):
+        # Порядок операций как в transform соответствующего скейлера
+        X = X.astype(float)
+
+        if self.sub is not None:
+            X -= self.sub
+        if self.div is not None:
+            X /= self.div
+        if self.mul is not None:
+            X *= self.mul
+        if self.add is not None:
+            X += self.add
+        if self.clip is not None:
+            np.clip(X, self.clip[0], self.clip[1], out=X)
+
+        return X
+
+
+class _Poly:
+    def __init__(self, poly):
+        # Моном x_i * x_j * x_k (i <= j <= k) PolynomialFeatures строит как (x_k * x_j) * x_i,
+        # поэтому множители перемножаются от старшего индекса к младшему
+        self.terms = [
+            np.repeat(np.arange(len(powers)), powers)[::-1]
+            for powers in poly.powers_
+        ]
+
+    def __call__(self, X):
+        result = np.ones((len(X), len(self.terms)))
+
+        for j, term in enumerate(self.terms):
+            if len(term):
+                result[:, j] = X[:, term[0]]
+
+                for i in term[1:]:
+                    result[:, j] *= X[:, i]
+
+        return result
+
+
+def compile_step(step):
+    if step is None or step == 'passthrough':
+        return None
+
+    if isinstance(step, FunctionTransformer) and step.func is None:
+        return None
+
+    if isinstance(step, SimpleImputer):
+        return _Impute(step)
+
+    if isinstance(step, OneHotEncoder):
+        return _OneHot(step)
+
+    if isinstance(step, OrdinalEncoder):
+        return _Ordinal(step)
+
+    if isinstance(step, PolynomialFeatures):
+        return _Poly(step)
+
+    return _Affine.from_scaler(step)
+
+
+class CompiledPreprocessor:
+    def __init__(self, preprocessor):
+        if preprocessor.sparse_output_:
+            raise TypeError('Разреженный выход ColumnTransformer не поддерживается')
+
+        self.feature_names_in_ = preprocessor.feature_names_in_
+        self.transformers_ = []
+
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+
+            # Столбцы remainder могут быть заданы позициями
+            columns = [self.feature_names_in_[col] if isinstance(col, (int, np.integer)) else col for col in columns]
+            steps = [step for _, step in transformer.steps] if isinstance(transformer, Pipeline) else [transformer]
+            steps = [compiled for compiled in map(compile_step, steps) if compiled is not None]
+
+            self.transformers_.append((name, steps, columns))
+
+    def transform(self, X):
+        '''
+        X - DataFrame или словарь столбец -> массив значений
+        '''
+
+        blocks = []
+
+        for _, steps, columns in self.transformers_:
+            block = np.column_stack([np.asarray(X[col]) for col in columns])
+
+            for step in steps:
+                block = step(block)
+
+            blocks.append(block.astype(float, copy=False))
+
+        return np.hstack(blocks)
+
+
+class CompiledPipeline:
+    '''
+    Пайплайн со скомпилированным препроцессором и исходной моделью
+
+    Предоставляет те же feature_names_in_, named_steps, predict и predict_proba,
+    что и Pipeline, поэтому подменяет его в scoring и service
+    '''
+
+    def __init__(self, pipeline):
+        self.feature_names_in_ = pipeline.feature_names_in_
+        self.named_steps = Bunch(
+            preprocessor=CompiledPreprocessor(pipeline.named_steps.preprocessor),
+            model=pipeline.named_steps.model
+        )
+
+    def predict(self, X):
+        return self.named_steps.model.predict(self.named_steps.preprocessor.transform(X))
+
+    def predict_proba(self, X):
+        return self.named_steps.model.predict_proba(self.named_steps.preprocessor.transform(X))
+
+
+def check_compiled(preprocessor, compiled, X):
+    expected = preprocessor.transform(X)
+    actual = compiled.transform(X)
+
+    if expected.shape != actual.shape or not np.array_equal(expected, actual, equal_nan=True):
+        raise ValueError('Выход скомпилированного препроцессора не совпадает с preprocessor.transform')
+
+
+def compile_pipeline(pipeline, X=None):
+    '''
+    Компилирует препроцессор обученного пайплайна build_pipeline
+
+    При заданном X выход сравнивается с preprocessor.transform(X) и при
+    расхождении выбрасывается ValueError
+
+    Возвращает CompiledPipeline
+    '''
+
+    compiled = CompiledPipeline(pipeline)
+
+    if X is not None:
+        check_compiled(pipeline.named_steps.preprocessor, compiled.named_steps.preprocessor, X)
+
+    return compiled
@@ -0,0 +1,437 @@
+'''
+Матрица корреляции Phi_K
+
+Тот же расчет, что и DataFrame.phik_matrix из пакета phik, но столбцы
+бинируются и переводятся в целочисленные коды один раз на таблицу, а таблица
+сопряженности каждой пары строится одним np.bincount по комбинированным
+кодам вместо groupby/unstack. Пересчет хи-квадрат в Phi_K (подбор
+корреляции двумерного нормального распределения) выполняется параллельно
+в пуле процессов, готовые матрицы кэшируются по хэшу таблицы и параметрам
+
+Для пополняемых данных (ежемесячные выгрузки) есть IncrementalPhiK: таблицы
+сопряженности хранятся между вызовами, новые строки добавляют в них свои
+частоты, а вышедшие из окна - вычитают, поэтому обновление стоит
+пропорционально новым данным, а Phi_K пересчитывается по готовым частотам
+'''
+
+import warnings
+
+from collections import OrderedDict, deque, namedtuple
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from joblib import Parallel, delayed
+from phik.binning import bin_edges
+from phik.phik import phik_from_hist2d
+from phik.utils import guess_interval_cols
+
+from hr_analytics.profiling import frame_hash
+
+N_JOBS = -1
+CACHE_SIZE = 16
+
+# Как в phik: предупреждение о категориальном признаке с большим кол-вом значений
+MAX_CATEGORIES = 1000
+
+_cache = OrderedDict()
+
+
+def get_bin_edges(values, col, bins, quantile):
+    if isinstance(bins, dict):
+        if col not in bins:
+            raise ValueError(f'Для столбца {col} не заданы бины')
+
+        bins = bins[col]
+
+    if isinstance(bins, (list, np.ndarray)):
+        return np.asarray(bins)
+
+    return bin_edges(values, int(bins), quantile=quantile)
+
+
+# Коды столбца (-1 - строка не учитывается в парах), кол-во кодов, сохранять ли
+# пустые уровни в таблице сопряженности и кол-во уникальных значений без NaN
+EncodedColumn = namedtuple('EncodedColumn', ['codes', 'n_codes', 'keep_empty', 'n_unique'])
+
+
+def interval_codes(values, edges, dropna=True, drop_underflow=True, drop_overflow=True):
+    '''
+    Коды бинов интервального столбца, как bin_array в phik: бины 1...n, 0 -
+    underflow, n + 1 - overflow. Неотбрасываемые underflow, overflow и NaN
+    получают отдельные коды
+    '''
+
+    n_bins = len(edges) - 1
+    codes = np.searchsorted(edges, values).astype(np.intp)
+
+    underflow = codes == 0
+    overflow = codes == n_bins + 1
+    codes -= 1
+    codes[underflow] = -1 if drop_underflow else n_bins
+    codes[overflow] = -1 if drop_overflow else n_bins + 1
+    codes[np.isnan(values)] = -1 if dropna else n_bins + 2
+
+    return codes, n_bins + 3
+
+
+def encode_column(values, dropna=True):
+    '''
+    Коды неинтервального столбца. У категорий, как и в phik (groupby с
+    observed=False), в таблицу сопряженности попадают все категории
+    '''
+
+    categorical = isinstance(values.dtype, pd.CategoricalDtype)
+
+    if categorical:
+        codes = values.cat.codes.to_numpy().astype(np.intp)
+        n_codes = len(values.cat.categories)
+        n_unique = np.count_nonzero(np.bincount(codes[codes >= 0], minlength=n_codes))
+    else:
+        codes, uniques = pd.factorize(values)
+        codes = codes.astype(np.intp)
+        n_codes = n_unique = len(uniques)
+
+    # Без dropna NaN - отдельный уровень, если он встретился. У категорий, как
+    # в phik (replace(np.nan, 'NaN') не добавляет категорию), строки с NaN
+    # отбрасываются и без dropna
+    if not dropna and not categorical and (codes < 0).any():
+        codes = np.where(codes < 0, n_codes, codes)
+        n_codes += 1
+
+    return EncodedColumn(codes, n_codes, categorical, n_unique)
+
+
+def encode_frame(df, interval_cols, bins=10, quantile=False, dropna=True, drop_underflow=True, drop_overflow=True):
+    '''
+    Бинирует интервальные столбцы и кодирует все столбцы за один проход по
+    каждому. Столбцы, по которым Phi_K не считается (меньше двух значений),
+    отбрасываются с предупреждением, как в phik
+
+    Возвращает словарь {столбец: EncodedColumn}
+    '''
+
+    encoded = {}
+
+    for col in df.columns:
+        if col in interval_cols:
+            values = df[col].to_numpy(dtype=float)
+            n_unique = len(np.unique(values[~np.isnan(values)]))
+
+            if n_unique < 2:
+                warnings.warn(f'Столбец {col}: уникальных значений {n_unique}, столбец пропущен')
+                continue
+
+            edges = get_bin_edges(values, col, bins, quantile)
+            codes, n_codes = interval_codes(values, edges, dropna, drop_underflow, drop_overflow)
+            encoded[col] = EncodedColumn(codes, n_codes, False, n_unique)
+        else:
+            column = encode_column(df[col], dropna)
+
+            if column.n_unique > MAX_CATEGORIES:
+                warnings.warn(f'Столбец {col}: уникальных значений {column.n_unique}, возможно, он интервальный')
+
+            if column.n_unique == 0 or (column.n_unique == 1 and dropna):
+                warnings.warn(f'Столбец {col}: уникальных значений {column.n_unique}, столбец пропущен')
+                continue
+
+            encoded[col] = column
+
+    return encoded
+
+
+def count_table(x, y):
+    # Частоты всех комбинаций кодов, включая пустые
+    mask = (x.codes >= 0) & (y.codes >= 0)
+    combined = x.codes[mask] * y.n_codes + y.codes[mask]
+
+    return np.bincount(combined, minlength=x.n_codes * y.n_codes).reshape(x.n_codes, y.n_codes)
+
+
+def trim_table(table, keep_empty_rows=False, keep_empty_cols=False):
+    # Пустые уровни остаются только у категорий
+    if not keep_empty_rows:
+        table = table[table.sum(axis=1) > 0]
+
+    if not keep_empty_cols:
+        table = table[:, table.sum(axis=0) > 0]
+
+    return table
+
+
+def contingency_table(x, y):
+    '''
+    Таблица сопряженности двух закодированных столбцов
+    '''
+
+    return trim_table(count_table(x, y), x.keep_empty, y.keep_empty)
+
+
+def phik_from_table(table, noise_correction=True):
+    # При одном уровне у одного из признаков Phi_K не определен
+    if 0 in table.shape or 1 in table.shape:
+        return np.nan
+
+    return phik_from_hist2d(table.astype(float), noise_correction=noise_correction)
+
+
+def phik_matrix(df,
+                interval_cols=None,
+                bins=10,
+                quantile=False,
+                noise_correction=True,
+                dropna=True,
+                drop_underflow=True,
+                drop_overflow=True,
+                verbose=True,
+                n_jobs=N_JOBS,
+                use_cache=True):
+    '''
+    Матрица корреляции Phi_K, параметры как у DataFrame.phik_matrix
+
+    n_jobs - кол-во процессов для пересчета пар. Результат кэшируется по хэшу
+    таблицы и параметрам расчета (use_cache=False - без кэша)
+    '''
+
+    params = (
+        None if interval_cols is None else tuple(interval_cols),
+        repr(bins),
+        quantile,
+        noise_correction,
+        dropna,
+        drop_underflow,
+        drop_overflow,
+    )
+    key = (frame_hash(df), params) if use_cache else None
+
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key].copy()
+
+    if interval_cols is None:
+        interval_cols = guess_interval_cols(df, verbose)
+
+    encoded = encode_frame(df, list(interval_cols), bins, quantile, dropna, drop_underflow, drop_overflow)
+    columns = pd.Index(list(encoded), dtype=df.columns.dtype)
+    encoded = list(encoded.values())
+    pairs = list(combinations(range(len(columns)), 2))
+    tables = [contingency_table(encoded[i], encoded[j]) for i, j in pairs]
+
+    values = Parallel(n_jobs=n_jobs)(
+        delayed(phik_from_table)(table, noise_correction) for table in tables
+    )
+
+    matrix = np.eye(len(columns))
+
+    for (i, j), value in zip(pairs, values):
+        matrix[i, j] = matrix[j, i] = value
+
+    corr_matrix = pd.DataFrame(matrix, index=columns, columns=columns)
+
+    if use_cache:
+        _cache[key] = corr_matrix
+
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return corr_matrix.copy()
+
+
+def pad_table(table, shape):
+    # Таблица дополняется нулями под уровни, появившиеся позже
+    return np.pad(table, [(0, shape[0] - table.shape[0]), (0, shape[1] - table.shape[1])])
+
+
+class IncrementalPhiK:
+    '''
+    Матрица Phi_K по пополняемым данным
+
+    update(df) добавляет частоты новых строк в хранимые таблицы сопряженности
+    всех пар, remove(df) вычитает частоты ранее добавленных строк. При
+    window=N хранятся частоты последних N пакетов, а самый старый пакет
+    вычитается автоматически. phik_matrix() пересчитывает только Phi_K по
+    готовым таблицам, параметры - как у phik_matrix
+
+    Границы бинов интервальных столбцов фиксируются по первому пакету (или
+    задаются списками в bins), значения вне них - underflow/overflow.
+    Категории и значения остальных столбцов накапливаются по мере появления.
+    Объект сохраняется между запусками через joblib.dump
+    '''
+
+    def __init__(self,
+                 interval_cols,
+                 bins=10,
+                 quantile=False,
+                 noise_correction=True,
+                 dropna=True,
+                 drop_underflow=True,
+                 drop_overflow=True,
+                 window=None,
+                 n_jobs=N_JOBS):
+        self.interval_cols = list(interval_cols)
+        self.bins = bins
+        self.quantile = quantile
+        self.noise_correction = noise_correction
+        self.dropna = dropna
+        self.drop_underflow = drop_underflow
+        self.drop_overflow = drop_overflow
+        self.window = window
+        self.n_jobs = n_jobs
+
+        self.columns_ = None
+        self.n_rows_ = 0
+        self.edges_ = {}
+        self.levels_ = {}
+        self.keep_empty_ = {}
+        self.counts_ = {}
+        self.tables_ = {}
+        self.batches_ = deque()
+
+    def _encode_levels(self, col, values):
+        # Коды по накопленному словарю уровней столбца, новые значения дописываются в конец
+        levels = self.levels_.get(col, pd.Index([], dtype=object))
+
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            self.keep_empty_[col] = True
+            codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            self.keep_empty_.setdefault(col, False)
+            codes, uniques = pd.factorize(values)
+
+        # Как в encode_column: уровень NaN только у некатегориальных столбцов, если встретился
+        if not self.dropna and not self.keep_empty_[col] and (codes < 0).any():
+            uniques = uniques.append(pd.Index([np.nan]))
+            codes = np.where(codes < 0, len(uniques) - 1, codes)
+
+        levels = levels.append(uniques.difference(levels, sort=False))
+        self.levels_[col] = levels
+
+        # Код -1 (NaN) попадает на добавленный в конец -1
+        mapping = np.append(levels.get_indexer(uniques), -1)
+
+        return EncodedColumn(mapping[codes].astype(np.intp), len(levels), self.keep_empty_[col], None)
+
+    def _encode(self, df):
+        missing = [col for col in self.columns_ if col not in df.columns]
+
+        if missing:
+            raise ValueError(f'В пакете нет столбцов {missing}')
+
+        encoded = []
+
+        for col in self.columns_:
+            if col in self.interval_cols:
+                values = df[col].to_numpy(dtype=float)
+
+                if col not in self.edges_:
+                    self.edges_[col] = get_bin_edges(values, col, self.bins, self.quantile)
+
+                codes, n_codes = interval_codes(
+                    values, self.edges_[col], self.dropna, self.drop_underflow, self.drop_overflow
+                )
+                encoded.append(EncodedColumn(codes, n_codes, False, None))
+            else:
+                encoded.append(self._encode_levels(col, df[col]))
+
+        return encoded
+
+    def _count(self, df):
+        if self.columns_ is None:
+            self.columns_ = list(df.columns)
+
+        encoded = self._encode(df)
+        counts = [np.bincount(column.codes[column.codes >= 0], minlength=column.n_codes) for column in encoded]
+        tables = {(i, j): count_table(encoded[i], encoded[j]) for i, j in combinations(range(len(encoded)), 2)}
+
+        return len(df), counts, tables
+
+    def _add(self, batch, sign=1):
+        n_rows, counts, tables = batch
+
+        for i, column_counts in enumerate(counts):
+            current = self.counts_.get(i, np.zeros(0, dtype=np.int64))
+            size = max(len(current), len(column_counts))
+            self.counts_[i] = np.pad(current, (0, size - len(current))) + sign * np.pad(
+                column_counts, (0, size - len(column_counts))
+            )
+
+        for pair, table in tables.items():
+            current = self.tables_.get(pair, np.zeros((0, 0), dtype=np.int64))
+            shape = np.maximum(current.shape, table.shape)
+            self.tables_[pair] = pad_table(current, shape) + sign * pad_table(table, shape)
+
+        self.n_rows_ += sign * n_rows
+
+        if self.n_rows_ < 0 or any((column_counts < 0).any() for column_counts in self.counts_.values()):
+            raise ValueError('Удаляются строки, которые не были добавлены')
+
+    def update(self, df):
+        batch = self._count(df)
+        self._add(batch)
+
+        if self.window is not None:
+            self.batches_.append(batch)
+
+            if len(self.batches_) > self.window:
+                self._add(self.batches_.popleft(), sign=-1)
+
+        return self
+
+    def remove(self, df):
+        if self.columns_ is None:
+            raise ValueError('Нет добавленных строк')
+
+        self._add(self._count(df), sign=-1)
+
+        return self
+
+    def _n_unique(self, i):
+        col = self.columns_[i]
+        counts = self.counts_[i]
+
+        if col in self.interval_cols:
+            # Без сырых значений уникальность оценивается по непустым бинам
+            counts = counts[:len(self.edges_[col]) - 1]
+        elif not self.dropna:
+            counts = counts[self.levels_[col].notna()]
+
+        return np.count_nonzero(counts)
+
+    def _keep_column(self, i):
+        n_unique = self._n_unique(i)
+        col = self.columns_[i]
+
+        if col in self.interval_cols:
+            keep = n_unique >= 2
+        else:
+            keep = not (n_unique == 0 or (n_unique == 1 and self.dropna))
+
+        if not keep:
+            warnings.warn(f'Столбец {col}: уникальных значений {n_unique}, столбец пропущен')
+
+        return keep
+
+    def phik_matrix(self):
+        if self.columns_ is None:
+            raise ValueError('Нет добавленных строк')
+
+        keep = [i for i in range(len(self.columns_)) if self._keep_column(i)]
+        columns = pd.Index([self.columns_[i] for i in keep])
+        pairs = list(combinations(range(len(keep)), 2))
+        keep_empty = [self.keep_empty_.get(self.columns_[i], False) for i in keep]
+        tables = [
+            trim_table(self.tables_[keep[i], keep[j]], keep_empty[i], keep_empty[j])
+            for i, j in pairs
+        ]
+
+        values = Parallel(n_jobs=self.n_jobs)(
+            delayed(phik_from_table)(table, self.noise_correction) for table in tables
+        )
+
+        matrix = np.eye(len(columns))
+
+        for (i, j), value in zip(pairs, values):
+            matrix[i, j] = matrix[j, i] = value
+
+        return pd.DataFrame(matrix, index=columns, columns=columns)
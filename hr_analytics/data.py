@@ -0,0 +1,339 @@
+'''
+Загрузка и предобработка исходных данных о сотрудниках
+'''
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+PARQUET_CACHE_DIR = os.path.join('.cache', 'parquet')
+
+FORMATS = {
+    'parquet': ('.parquet', '.pq'),
+    'feather': ('.feather', '.arrow', '.ipc'),
+}
+
+YES_NO = {'yes': True, 'no': False}
+
+# Доля уникальных значений, до которой map_unique работает со словарем значений
+MAX_UNIQUE_SHARE = 0.5
+
+# Опечатки в значениях исходных данных
+VALUE_TYPOS = {'level': {'sinior': 'senior'}}
+
+# Типы столбцов как после convert_columns_dtype в ноутбуке, числовые - с понижением разрядности.
+# Кроме 'category' и числовых типов схема допускает 'bool' - столбец yes/no читается в boolean
+FEATURES_SCHEMA = {
+    'dept': 'category',
+    'level': 'category',
+    'workload': 'category',
+    'last_year_promo': 'category',
+    'last_year_violations': 'category',
+    'supervisor_evaluation': 'category',
+    'quit': 'category',
+    'employment_years': 'int32',
+    'salary': 'int32',
+    'job_satisfaction_rate': 'float32',
+}
+
+
+def get_format(filename):
+    ext = os.path.splitext(filename)[1].lower()
+
+    for fmt, extensions in FORMATS.items():
+        if ext in extensions:
+            return fmt
+
+    return 'csv'
+
+
+def get_read_dtypes(schema):
+    # Столбцы yes/no парсятся как category и переводятся в boolean на уровне категорий
+    return {col: 'category' if kind == 'bool' else kind for col, kind in schema.items()}
+
+
+def apply_schema(df, schema):
+    for col, kind in schema.items():
+        if col not in df:
+            continue
+
+        if kind == 'bool':
+            if not isinstance(df[col].dtype, pd.BooleanDtype):
+                df[col] = df[col].map(YES_NO).astype('boolean')
+        elif kind == 'category':
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+
+            # Парсер C читает категории как строки: числовые категории ('1'...'5') приводятся к числам
+            categories = df[col].cat.categories
+
+            if categories.dtype == object and len(categories):
+                numeric = pd.to_numeric(categories, errors='coerce')
+
+                if not numeric.isna().any():
+                    df[col] = df[col].cat.rename_categories(numeric)
+        elif df[col].dtype != kind:
+            df[col] = df[col].astype(kind)
+
+    return df
+
+
+def read_csv(source, schema=None, **params):
+    if schema:
+        params['dtype'] = {**get_read_dtypes(schema), **params.get('dtype', {})}
+
+    # Движок pyarrow (многопоточный парсинг) не совмещает index_col с dtype, индекс ставится после чтения
+    index_col = params.pop('index_col', None) if params.get('engine') == 'pyarrow' else None
+
+    df = pd.read_csv(source, **params)
+
+    if index_col is not None:
+        df = df.set_index(index_col)
+
+    return apply_schema(df, schema) if schema else df
+
+
+def get_cache_path(source, cache_dir, params):
+    # Ключ кэша меняется при изменении файла или параметров чтения
+    stat = os.stat(source)
+    key = repr((os.path.abspath(source), stat.st_mtime_ns, stat.st_size, sorted(params.items())))
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()[:16]
+
+    return os.path.join(cache_dir, f'{os.path.basename(source)}.{digest}.parquet')
+
+
+def read_csv_cached(source, cache_dir, schema=None, **params):
+    cache_path = get_cache_path(source, cache_dir, {**params, 'schema': schema})
+
+    if not os.path.exists(cache_path):
+        df = read_csv(source, schema, **params)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        df.to_parquet(f'{cache_path}.tmp', engine='pyarrow')
+        os.replace(f'{cache_path}.tmp', cache_path)
+
+    return cache_path
+
+
+def sort_categories(df, columns):
+    for col in columns:
+        if col in df and isinstance(df[col].dtype, pd.CategoricalDtype) and not df[col].cat.ordered:
+            df[col] = df[col].cat.reorder_categories(df[col].cat.categories.sort_values())
+
+    return df
+
+
+def load_data(filename,
+              remote_path=None,
+              columns=None,
+              categories=None,
+              schema=None,
+              cache_dir=None,
+              **params):
+    '''
+    Загружает CSV, Parquet, Feather или Arrow IPC (формат - по расширению файла)
+
+    При заданном cache_dir (например, PARQUET_CACHE_DIR) локальный CSV при первом
+    чтении сохраняется в кэш Parquet, повторные чтения идут из него. Из Parquet читаются только столбцы
+    columns, а столбцы categories сразу читаются как словарные (category) без
+    промежуточных строк object. params передаются в pd.read_csv, index_col
+    применяется ко всем форматам
+
+    schema (например, FEATURES_SCHEMA) задает типы столбцов: 'category', 'bool'
+    (yes/no) или числовой тип. Для CSV типы применяются при парсинге, поэтому пик
+    памяти близок к размеру итоговой таблицы, а не к таблице строк object.
+    engine='pyarrow' парсит многопоточно, но пик памяти выше (буферы Arrow)
+    '''
+
+    local_file = os.path.join(filename)
+
+    if os.path.exists(filename):
+        source = local_file
+        source_type = 'Локальный'
+    else:
+        source = f'{remote_path.rstrip("/")}/{filename}'
+        source_type = 'URL'
+
+    fmt = get_format(filename)
+    index_col = params.get('index_col')
+
+    if fmt == 'csv' and (cache_dir is None or source_type == 'URL'):
+        if columns is not None:
+            params['usecols'] = [*columns, *([index_col] if index_col is not None else [])]
+
+        df = read_csv(source, schema, **params)
+
+        if categories:
+            df = convert_columns_dtype(df, {col: 'category' for col in categories if col in df})
+    else:
+        if fmt == 'csv':
+            source = read_csv_cached(source, cache_dir, schema, **params)
+            fmt = 'parquet'
+
+        # Индекс попадает в проекцию, хранится ли он в метаданных pandas или обычным столбцом
+        if columns is not None and index_col is not None:
+            columns = [*columns, index_col]
+
+        if fmt == 'parquet':
+            df = pd.read_parquet(source, columns=columns, read_dictionary=categories)
+
+            # Словарь Parquet хранит категории в порядке появления, а astype('category')
+            # сортирует их: коды и порядок one-hot столбцов не зависят от кэша
+            if categories:
+                df = sort_categories(df, categories)
+        else:
+            df = pd.read_feather(source, columns=columns)
+
+            if categories:
+                df = convert_columns_dtype(df, {col: 'category' for col in categories if col in df})
+
+        if index_col is not None and index_col in df.columns:
+            df = df.set_index(index_col)
+
+        if schema:
+            df = apply_schema(df, schema)
+
+    df.attrs['name'] = filename
+    df.attrs['source_type'] = source_type
+
+    return df
+
+
+def cols_names_cleaner(df):
+    df.columns = (
+        df
+        .columns
+        .str.lower()
+        .str.replace(' ', '_')
+    )
+
+    return df
+
+
+def text_vals_cleaner(x):
+    return map_unique(
+        x,
+        lambda values: (
+            values
+            .str.lower()
+            .str.replace(' ', '_')
+        )
+    )
+
+
+def map_categories(values, func):
+    '''
+    Применяет func к категориям (pd.Index) вместо всех строк и переносит результат
+    на строки через коды. Совпавшие после func категории объединяются, NaN
+    удаляет категорию
+    '''
+
+    mapped = pd.Index(func(values.cat.categories))
+    inverse, categories = pd.factorize(mapped)
+    # Код -1 (NaN) попадает на добавленный в конец -1
+    codes = np.append(inverse, -1)[values.cat.codes.to_numpy()]
+
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=categories),
+        index=values.index,
+        name=values.name
+    )
+
+
+def map_unique(values, func):
+    '''
+    Применяет строковую операцию func к уникальным значениям Series и переносит
+    результат на строки через коды: для категорий - по словарю категорий, для
+    object - после pd.factorize, если уникальных значений немного. Для Index и
+    столбцов высокой кардинальности func применяется напрямую
+    '''
+
+    if not isinstance(values, pd.Series):
+        return func(values)
+
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return map_categories(values, func)
+
+    codes, uniques = pd.factorize(values)
+
+    if len(uniques) > len(values) * MAX_UNIQUE_SHARE:
+        return func(values)
+
+    mapped = np.append(np.asarray(func(uniques), dtype=object), np.nan)
+
+    return pd.Series(mapped[codes], index=values.index, name=values.name)
+
+
+def find_implicit_duplicates(df):
+    '''
+    Ищет в текстовых и категориальных столбцах разные написания одного значения
+    (регистр, пробелы по краям). Нормализуются только уникальные значения столбца
+
+    Возвращает DataFrame со столбцами column, values, normalized
+    '''
+
+    found = []
+
+    for col in df.select_dtypes(include=['object', 'category']):
+        values = df[col]
+
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Только встречающиеся в данных категории
+            codes = values.cat.codes.to_numpy()
+            observed = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories)) > 0
+            uniques = values.cat.categories[observed]
+        else:
+            uniques = pd.Index(values.dropna().unique())
+
+        uniques = pd.Index(uniques.astype(str).unique())
+        normed = uniques.str.lower().str.strip()
+
+        for norm_val, origs in pd.Series(uniques, index=normed).groupby(level=0):
+            if len(origs) > 1:
+                found.append({'column': col, 'values': list(origs), 'normalized': norm_val})
+
+    return pd.DataFrame(found, columns=['column', 'values', 'normalized'])
+
+
+def text_vals_to_nan(df):
+    mask = df.select_dtypes(include=['object', 'category']).columns
+
+    for col in mask:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Пустые строки удаляются из словаря категорий, строки не просматриваются
+            categories = df[col].cat.categories
+            blank = categories[categories.astype(str).str.fullmatch(r'\s*')]
+
+            if len(blank):
+                df[col] = df[col].cat.remove_categories(blank)
+        else:
+            df[col] = df[col].replace(r'^\s*$', np.nan, regex=True)
+
+    return df
+
+
+def rename_values(df, mapping):
+    '''
+    Переименовывает значения по словарю {столбец: {старое: новое}}, для
+    категориальных столбцов - на уровне категорий
+    '''
+
+    for col, values in mapping.items():
+        if col not in df.columns:
+            continue
+
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = map_categories(df[col], lambda categories: categories.map(lambda v: values.get(v, v)))
+        else:
+            df[col] = df[col].replace(values)
+
+    return df
+
+
+def convert_columns_dtype(df, dtype_mapping):
+    for col, dtype in dtype_mapping.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    return df
@@ -0,0 +1,162 @@
+'''
+Генератор синтетических данных о сотрудниках по схеме исходных CSV
+
+Совместное распределение признаков задается цепочкой условных частот: каждый
+столбец сэмплируется при условии уже сгенерированных столбцов-родителей
+(например, отдел и зарплата - при условии грейда). Для редких комбинаций
+родителей используется откат к распределению по меньшему набору родителей.
+Значения берутся из исходных данных как есть, поэтому сохраняются и опечатки
+вида 'sinior', а пропуски (NaN и пустые строки) вносятся с долями, оцененными
+по исходному файлу
+
+    python -m hr_analytics generate train_quit.csv train_quit_1m.csv --n-rows 1000000 --seed 42
+'''
+
+import numpy as np
+import pandas as pd
+
+CHUNKSIZE = 100_000
+MIN_GROUP_SIZE = 20
+
+# Родители столбцов в порядке генерации; столбцы не из списка сэмплируются по маргинальным частотам
+DEFAULT_PARENTS = {
+    'level': [],
+    'dept': ['level'],
+    'workload': ['level'],
+    'employment_years': ['level'],
+    'last_year_promo': ['level', 'workload'],
+    'last_year_violations': ['level'],
+    'supervisor_evaluation': ['workload'],
+    'salary': ['level', 'workload', 'dept'],
+    'quit': ['level', 'workload', 'employment_years', 'supervisor_evaluation'],
+    'job_satisfaction_rate': ['supervisor_evaluation', 'level', 'workload'],
+}
+
+
+def is_blank(values):
+    return values.astype(str).str.fullmatch(r'\s*') & values.notna()
+
+
+class HRDataGenerator:
+    def __init__(self, parents=None, min_group_size=MIN_GROUP_SIZE, index_col='id'):
+        self.parents = DEFAULT_PARENTS if parents is None else parents
+        self.min_group_size = min_group_size
+        self.index_col = index_col
+
+    def fit(self, df):
+        '''
+        Оценивает условные частоты и доли пропусков по исходной таблице (без очистки)
+        '''
+
+        df = df.drop(columns=self.index_col, errors='ignore')
+
+        self.columns_ = list(df.columns)
+        self.dtypes_ = df.dtypes
+        # Порядок генерации: сначала столбцы из DEFAULT_PARENTS, затем остальные
+        self.order_ = [col for col in self.parents if col in df] + [col for col in df if col not in self.parents]
+        self.parents_ = {col: [p for p in self.parents.get(col, []) if p in df] for col in self.order_}
+
+        blank = df.apply(is_blank)
+        gap = df.isna() | blank
+
+        self.nan_rate_ = df.isna().mean()
+        self.blank_rate_ = blank.mean()
+        self.tables_ = {}
+
+        for col in self.order_:
+            parents = self.parents_[col]
+            observed = df.loc[~gap[[col, *parents]].any(axis=1), [col, *parents]]
+            # Таблицы частот для всех префиксов родителей, от полного набора до маргинальной
+            self.tables_[col] = [self._fit_table(observed, col, parents[:k]) for k in range(len(parents) + 1)]
+
+        return self
+
+    def _fit_table(self, observed, col, parents):
+        if not parents:
+            freqs = observed[col].value_counts(normalize=True)
+            return {(): (freqs.index.to_numpy(), freqs.to_numpy())}
+
+        table = {}
+
+        for key, group in observed.groupby(parents, sort=False):
+            if len(group) >= self.min_group_size:
+                freqs = group[col].value_counts(normalize=True)
+                table[key] = (freqs.index.to_numpy(), freqs.to_numpy())
+
+        return table
+
+    def _sample_column(self, chunk, col, rng):
+        parents = self.parents_[col]
+        tables = self.tables_[col]
+
+        if not parents:
+            values, probs = tables[0][()]
+            return rng.choice(values, size=len(chunk), p=probs)
+
+        result = np.empty(len(chunk), dtype=object)
+
+        for key, idx in chunk.groupby(parents, sort=False).indices.items():
+            key = key if isinstance(key, tuple) else (key,)
+
+            # Откат к меньшему набору родителей, если комбинация редкая
+            for k in range(len(parents), -1, -1):
+                if key[:k] in tables[k]:
+                    values, probs = tables[k][key[:k]]
+                    break
+
+            result[idx] = rng.choice(values, size=len(idx), p=probs)
+
+        return result
+
+    def _add_gaps(self, chunk, rng):
+        for col in self.columns_:
+            nan_rate, blank_rate = self.nan_rate_[col], self.blank_rate_[col]
+
+            if nan_rate == 0 and blank_rate == 0:
+                continue
+
+            u = rng.random(len(chunk))
+            chunk[col] = chunk[col].astype(object)
+            chunk.loc[u < nan_rate, col] = np.nan
+            chunk.loc[(u >= nan_rate) & (u < nan_rate + blank_rate), col] = ' '
+
+        return chunk
+
+    def sample(self, n_rows, rng, start_id=0):
+        chunk = pd.DataFrame(index=pd.RangeIndex(n_rows))
+
+        for col in self.order_:
+            chunk[col] = self._sample_column(chunk, col, rng)
+
+        # Столбцы без пропусков в исходных данных сохраняют исходный тип
+        for col in self.columns_:
+            if self.nan_rate_[col] == 0 and self.blank_rate_[col] == 0:
+                chunk[col] = chunk[col].astype(self.dtypes_[col])
+
+        chunk = self._add_gaps(chunk[self.columns_], rng)
+        chunk.insert(0, self.index_col, np.arange(start_id, start_id + n_rows))
+
+        return chunk
+
+    def generate(self, n_rows, chunksize=CHUNKSIZE, random_state=None):
+        '''
+        Генерирует n_rows строк чанками по chunksize строк
+
+        Каждый чанк сэмплируется своим генератором, порожденным от random_state,
+        поэтому результат воспроизводим при одинаковых random_state и chunksize
+
+        Возвращает итератор по DataFrame
+        '''
+
+        n_chunks = -(-n_rows // chunksize)
+        seeds = np.random.SeedSequence(random_state).spawn(n_chunks)
+
+        for i, seed in enumerate(seeds):
+            start = i * chunksize
+            yield self.sample(min(chunksize, n_rows - start), np.random.default_rng(seed), start_id=start + 1)
+
+    def to_csv(self, path, n_rows, chunksize=CHUNKSIZE, random_state=None):
+        for i, chunk in enumerate(self.generate(n_rows, chunksize, random_state)):
+            chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+
+        return n_rows
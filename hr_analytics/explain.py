@@ -0,0 +1,338 @@
+'''
+Объяснение предсказаний моделей значениями SHAP
+
+Интервенционные SHAP-значения оцениваются по выборке перестановок признаков,
+как в shap.PermutationExplainer (пары прямая/обратная перестановка), но все
+возмущенные входы пачки строк собираются в один массив и оцениваются одним
+векторизованным вызовом predict только по уникальным входам. Пачки строк
+считаются параллельно в пуле процессов. Пустая и полная коалиции не
+пересчитываются: это среднее предсказание по фону и предсказание самой
+строки, поэтому сумма SHAP-значений строки и base_values точно равна ее
+предсказанию
+
+Бюджет max_evals - кол-во коалиций на строку, каждая оценивается по всему
+фону: строка стоит примерно max_evals * len(background) вызовов модели
+
+explain_model выбирает способ по типу модели: для линейных моделей значения
+считаются в замкнутой форме, для деревьев - точно по листьям дерева с тем же
+фоном, выборка перестановок остается для SVM, KNN и ядерных аппроксимаций
+'''
+
+import math
+
+import numpy as np
+import pandas as pd
+import shap
+
+from joblib import Parallel, delayed
+from sklearn.base import is_classifier
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.svm import LinearSVC, LinearSVR
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+
+N_JOBS = -1
+MAX_EVALS = 500
+
+# Строк в одном вызове predict
+BATCH_SIZE = 100_000
+
+LINEAR_MODELS = (LinearRegression, LogisticRegression, LinearSVR, LinearSVC)
+TREE_MODELS = (DecisionTreeRegressor, DecisionTreeClassifier)
+
+
+def get_n_permutations(n_features, max_evals=MAX_EVALS):
+    # Перестановка стоит n_features - 1 коалиций, их кол-во четное (пары прямая/обратная)
+    return 2 * max(1, max_evals // (2 * max(n_features - 1, 1)))
+
+
+def get_permutation_masks(n_features, n_permutations, rng):
+    '''
+    Перестановки признаков и маски коалиций
+
+    Возвращает ranks (шаг, на котором признак входит в коалицию, для каждой
+    перестановки) и masks[p, k] - признаки, включенные после k + 1 шагов
+    перестановки p
+    '''
+
+    perms = np.array([rng.permutation(n_features) for _ in range(n_permutations // 2)])
+    perms = np.concatenate([perms, perms[:, ::-1]])
+    ranks = np.argsort(perms, axis=1)
+    masks = ranks[:, None, :] <= np.arange(n_features - 1)[None, :, None]
+
+    return ranks, masks
+
+
+def predict_2d(predict, X):
+    output = np.asarray(predict(X), dtype=float)
+
+    return output.reshape(len(X), -1)
+
+
+def unique_rows(A):
+    # Уникальные строки двумерного массива и индексы строк среди них
+    rows = np.ascontiguousarray(A).view(np.dtype((np.void, A.dtype.itemsize * A.shape[1])))[:, 0]
+    _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+
+    return A[first], inverse.ravel()
+
+
+def predict_unique(predict, X):
+    '''
+    predict только по уникальным строкам X. Возмущенные входы сильно
+    повторяются: признаки с малым кол-вом значений (one-hot, порядковые)
+    часто совпадают у строки и фона, а коалиции - у разных перестановок
+    '''
+
+    uniques, inverse = unique_rows(X)
+
+    return predict_2d(predict, uniques)[inverse]
+
+
+def explain_chunk(predict, X, background, weights, fx, base_value, n_permutations, seed):
+    n_rows, n_features = X.shape
+    ranks, masks = get_permutation_masks(n_features, n_permutations, np.random.default_rng(seed))
+
+    # Возмущенные входы: (строка, перестановка, шаг, строка фона, признак)
+    inputs = np.where(
+        masks[None, :, :, None, :],
+        X[:, None, None, None, :],
+        background[None, None, None, :, :]
+    )
+    output = predict_unique(predict, inputs.reshape(-1, n_features))
+    output = output.reshape(n_rows, n_permutations, n_features - 1, len(background), -1)
+    values = np.einsum('rpkbo,b->rpko', output, weights)
+
+    # Цепочка значений от пустой коалиции до полной, приращение шага k - вклад признака perm[k]
+    chain = np.concatenate([
+        np.broadcast_to(base_value, (n_rows, n_permutations, 1, len(base_value))),
+        values,
+        np.broadcast_to(fx[:, None, None, :], (n_rows, n_permutations, 1, fx.shape[1])),
+    ], axis=2)
+    deltas = np.diff(chain, axis=2)
+
+    return deltas[:, np.arange(n_permutations)[:, None], ranks].mean(axis=1)
+
+
+def explain(predict,
+            X,
+            background,
+            weights=None,
+            max_evals=MAX_EVALS,
+            batch_size=BATCH_SIZE,
+            n_jobs=N_JOBS,
+            random_state=None):
+    '''
+    SHAP-значения predict (например, model.predict или model.predict_proba)
+    для строк X относительно фоновой выборки background
+
+    weights - веса строк фона (None - равные), max_evals - бюджет коалиций на
+    строку, batch_size - строк в одном вызове predict, n_jobs - кол-во
+    процессов. Возвращает shap.Explanation, совместимый с shap.plots
+    '''
+
+    feature_names = list(X.columns) if isinstance(X, pd.DataFrame) else None
+    X = np.asarray(X, dtype=float)
+    background = np.asarray(background, dtype=float)
+    weights = get_weights(background, weights)
+
+    n_rows, n_features = X.shape
+    n_permutations = get_n_permutations(n_features, max_evals)
+
+    fx = predict_2d(predict, X)
+    base_value = weights @ predict_2d(predict, background)
+
+    if n_features > 1:
+        rows_per_chunk = max(1, batch_size // (n_permutations * (n_features - 1) * len(background)))
+        starts = range(0, n_rows, rows_per_chunk)
+        seeds = np.random.SeedSequence(random_state).spawn(len(starts))
+
+        chunks = Parallel(n_jobs=n_jobs)(
+            delayed(explain_chunk)(
+                predict,
+                X[start:start + rows_per_chunk],
+                background,
+                weights,
+                fx[start:start + rows_per_chunk],
+                base_value,
+                n_permutations,
+                seed
+            )
+            for start, seed in zip(starts, seeds)
+        )
+        values = np.concatenate(chunks) if chunks else np.zeros((0, n_features, fx.shape[1]))
+    else:
+        # Единственный признак получает все отклонение от среднего
+        values = (fx - base_value)[:, None, :]
+
+    base_values = np.broadcast_to(base_value, fx.shape)
+
+    # Одномерный выход predict - без последней оси, как в shap
+    if fx.shape[1] == 1:
+        values, base_values = values[..., 0], base_values[:, 0]
+
+    return shap.Explanation(
+        values=values,
+        base_values=np.array(base_values),
+        data=X,
+        feature_names=feature_names
+    )
+
+
+def get_weights(background, weights=None):
+    return np.full(len(background), 1 / len(background)) if weights is None else np.asarray(weights) / np.sum(weights)
+
+
+def explain_linear(model, X, background, weights=None):
+    '''
+    Точные SHAP-значения линейной модели: coef * (x - среднее фона). Для
+    классификаторов - в шкале decision_function (log-odds), как в
+    shap.LinearExplainer; у бинарного классификатора два выхода, как у
+    predict_proba
+    '''
+
+    feature_names = list(X.columns) if isinstance(X, pd.DataFrame) else None
+    X = np.asarray(X, dtype=float)
+    mean = get_weights(background, weights) @ np.asarray(background, dtype=float)
+
+    coef = np.atleast_2d(model.coef_)
+    intercept = np.broadcast_to(model.intercept_, len(coef))
+    values = (X - mean)[:, :, None] * coef.T[None, :, :]
+    base_value = coef @ mean + intercept
+
+    if is_classifier(model) and len(coef) == 1:
+        values = np.concatenate([-values, values], axis=2)
+        base_value = np.concatenate([-base_value, base_value])
+
+    base_values = np.tile(base_value, (len(X), 1))
+
+    # Один выход - без последней оси, как в explain
+    if values.shape[2] == 1:
+        values, base_values = values[..., 0], base_values[:, 0]
+
+    return shap.Explanation(
+        values=values,
+        base_values=base_values,
+        data=X,
+        feature_names=feature_names
+    )
+
+
+def get_tree_leaves(tree):
+    '''
+    Листья дерева sklearn: границы признаков на пути к листу (lower < x <= upper)
+    и значения листьев (для классификатора - вероятности классов)
+    '''
+
+    lower, upper, leaves = [], [], []
+    stack = [(0, np.full(tree.n_features, -np.inf), np.full(tree.n_features, np.inf))]
+
+    while stack:
+        node, node_lower, node_upper = stack.pop()
+
+        if tree.children_left[node] == -1:
+            leaves.append(node)
+            lower.append(node_lower)
+            upper.append(node_upper)
+            continue
+
+        feature, threshold = tree.feature[node], tree.threshold[node]
+        left_upper, right_lower = node_upper.copy(), node_lower.copy()
+        left_upper[feature] = min(left_upper[feature], threshold)
+        right_lower[feature] = max(right_lower[feature], threshold)
+
+        stack.append((tree.children_left[node], node_lower, left_upper))
+        stack.append((tree.children_right[node], right_lower, node_upper))
+
+    values = tree.value[leaves][:, 0, :]
+
+    # В старых версиях sklearn value классификатора - частоты, а не доли
+    if tree.n_classes[0] > 1:
+        values = values / values.sum(axis=1, keepdims=True)
+
+    return np.array(lower), np.array(upper), values
+
+
+def explain_tree(model, X, background, weights=None):
+    '''
+    Точные интервенционные SHAP-значения дерева решений (для классификаторов -
+    в шкале predict_proba) за полиномиальное время
+
+    Для строки x и строки фона b лист достижим из их гибрида, если ни одно
+    условие пути не нарушают оба. Тогда значение листа v делится как в игре
+    "все признаки пути из нужной строки": признаки, нарушенные только b (Fb),
+    получают v * (|Fb| - 1)! |Fx|! / (|Fx| + |Fb|)!, нарушенные только x (Fx) -
+    симметрично со знаком минус. Строки и фон группируются по набору
+    нарушенных условий листа, поэтому пары считаются только между группами
+    '''
+
+    feature_names = list(X.columns) if isinstance(X, pd.DataFrame) else None
+    X = np.asarray(X, dtype=float)
+    background = np.asarray(background, dtype=float)
+    weights = get_weights(background, weights)
+    lower, upper, values = get_tree_leaves(model.tree_)
+
+    # Дерево sklearn сравнивает признаки в float32
+    X_tree = X.astype(np.float32).astype(float)
+    background_tree = background.astype(np.float32).astype(float)
+
+    path_length = (np.isfinite(lower) | np.isfinite(upper)).sum(axis=1)
+    factorials = np.array([math.factorial(i) for i in range(2 * path_length.max() + 1)], dtype=float)
+
+    n_rows, n_features = X.shape
+    shap_values = np.zeros((n_rows, n_features, values.shape[1]))
+
+    for leaf in range(len(values)):
+        path = np.flatnonzero(np.isfinite(lower[leaf]) | np.isfinite(upper[leaf]))
+
+        # Дерево из одного листа - константа, вкладов нет
+        if not len(path):
+            continue
+
+        def fails(A):
+            return (A[:, path] <= lower[leaf, path]) | (A[:, path] > upper[leaf, path])
+
+        fails_x, inverse_x = unique_rows(fails(X_tree))
+        fails_b, inverse_b = unique_rows(fails(background_tree))
+        weights_b = np.bincount(inverse_b, weights=weights, minlength=len(fails_b))
+
+        n_x, n_b = fails_x.sum(axis=1)[:, None], fails_b.sum(axis=1)[None, :]
+        reachable = ~(fails_x[:, None, :] & fails_b[None, :, :]).any(axis=-1) * weights_b[None, :]
+        total = factorials[n_x + n_b]
+        weight_x = np.where(n_b > 0, factorials[np.maximum(n_b - 1, 0)] * factorials[n_x], 0) / total
+        weight_b = np.where(n_x > 0, factorials[n_b] * factorials[np.maximum(n_x - 1, 0)], 0) / total
+
+        contributions = (reachable * weight_x) @ fails_b - fails_x * (reachable * weight_b).sum(axis=1)[:, None]
+        shap_values[:, path] += contributions[inverse_x][:, :, None] * values[leaf]
+
+    predict = model.predict_proba if is_classifier(model) else model.predict
+    base_value = weights @ predict_2d(predict, background)
+    base_values = np.tile(base_value, (n_rows, 1))
+
+    if not is_classifier(model):
+        shap_values, base_values = shap_values[..., 0], base_values[:, 0]
+
+    return shap.Explanation(
+        values=shap_values,
+        base_values=base_values,
+        data=X,
+        feature_names=feature_names
+    )
+
+
+def explain_model(model, X, background, weights=None, **params):
+    '''
+    SHAP-значения модели (named_steps.model пайплайна) для предобработанных
+    строк X: линейные модели - в замкнутой форме, деревья - TreeSHAP, остальные
+    модели - explain по predict_proba (классификаторы) или predict. params
+    передаются в explain
+    '''
+
+    if isinstance(model, LINEAR_MODELS):
+        return explain_linear(model, X, background, weights)
+
+    if isinstance(model, TREE_MODELS) and model.n_outputs_ == 1:
+        return explain_tree(model, X, background, weights)
+
+    predict = model.predict_proba if is_classifier(model) and hasattr(model, 'predict_proba') else model.predict
+
+    return explain(predict, X, background, weights, **params)
@@ -0,0 +1,280 @@
+'''
+Пермутационная важность признаков
+
+Тот же расчет, что и sklearn.inspection.permutation_importance (важность -
+падение метрики после перестановки столбца), но:
+
+- оценки раздаются пулу процессов joblib задачами (группа столбцов × пачка
+  повторов); матрица X передается воркерам через memmap (joblib делает это
+  для массивов больше max_nbytes), а не копией на каждую задачу
+- повторы идут раундами, и признак перестает повторяться, как только
+  доверительный интервал его важности становится достаточно узким
+- groups переставляет несколько столбцов вместе одной перестановкой строк,
+  например все one-hot столбцы исходного признака (get_feature_groups)
+
+pipeline_permutation_importance считает важность исходных столбцов
+пайплайна. Препроцессор применяется один раз: построчные преобразования
+одного столбца (импутеры, кодировщики, скейлеры) перестановку строк не
+меняют, поэтому перестановка исходного столбца - это перестановка его
+выходных столбцов. Заново считаются только трансформеры, смешивающие
+столбцы (например, PolynomialFeatures), и только на их входных столбцах
+'''
+
+import numpy as np
+
+from joblib import Parallel, delayed
+from scipy import stats
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import check_scoring
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import (
+    MaxAbsScaler,
+    MinMaxScaler,
+    OneHotEncoder,
+    OrdinalEncoder,
+    RobustScaler,
+    StandardScaler
+)
+from sklearn.utils import Bunch
+
+N_JOBS = -1
+
+# Повторов на группу: минимум, максимум и кол-во в одной задаче
+MIN_REPEATS = 5
+MAX_REPEATS = 30
+ROUND_REPEATS = 5
+
+# Остановка: половина доверительного интервала не больше rtol * |важность|
+# или tol (по умолчанию TOL_SHARE * |исходная метрика|)
+CONFIDENCE = 0.95
+RTOL = 0.1
+TOL_SHARE = 0.01
+
+# Построчные преобразования каждого столбца по отдельности
+COLUMN_WISE_TRANSFORMERS = (
+    SimpleImputer,
+    OneHotEncoder,
+    OrdinalEncoder,
+    StandardScaler,
+    MinMaxScaler,
+    RobustScaler,
+    MaxAbsScaler
+)
+
+
+def get_feature_groups(preprocessor):
+    '''
+    Группы выходных столбцов ColumnTransformer по исходным столбцам: one-hot
+    столбцы признака (ohe__dept_sales, ohe__dept_hr, ...) - одна группа dept.
+    Возвращает словарь {исходный столбец: [номера выходных столбцов]}
+    '''
+
+    # Самое длинное совпадение: last_year_promo, а не last_year
+    columns = sorted(preprocessor.feature_names_in_, key=len, reverse=True)
+    groups = {}
+
+    for i, name in enumerate(preprocessor.get_feature_names_out()):
+        name = name.split('__', 1)[-1]
+        # После имени столбца в выходном имени идут категория (_), степень (^) или произведение ( )
+        group = next((col for col in columns if name == col or (name.startswith(col) and name[len(col)] in '_^ ')), name)
+        groups.setdefault(group, []).append(i)
+
+    return groups
+
+
+def is_column_wise(transformer):
+    if transformer is None or transformer == 'passthrough':
+        return True
+
+    if isinstance(transformer, Pipeline):
+        return all(is_column_wise(step) for _, step in transformer.steps)
+
+    # add_indicator добавляет столбцы, которые не сопоставляются по именам
+    if isinstance(transformer, SimpleImputer) and transformer.add_indicator:
+        return False
+
+    return isinstance(transformer, COLUMN_WISE_TRANSFORMERS)
+
+
+def get_raw_groups(preprocessor):
+    '''
+    Что переставлять для каждого исходного столбца ColumnTransformer
+
+    Возвращает словарь {столбец: (выходные столбцы, блоки)}: выходные столбцы
+    построчных преобразований переставляются вместе с исходным, а блоки
+    (трансформер, его входные столбцы, срез выхода) пересчитываются
+    '''
+
+    owners = {i: col for col, outputs in get_feature_groups(preprocessor).items() for i in outputs}
+    groups = {col: ([], []) for col in preprocessor.feature_names_in_}
+
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == 'drop' or len(columns) == 0:
+            continue
+
+        # Столбцы remainder могут быть заданы позициями
+        columns = [preprocessor.feature_names_in_[col] if isinstance(col, (int, np.integer)) else col for col in columns]
+        block = preprocessor.output_indices_[name]
+        outputs = range(block.start, block.stop)
+
+        if is_column_wise(transformer) and all(owners.get(i) in columns for i in outputs):
+            for i in outputs:
+                groups[owners[i]][0].append(i)
+        else:
+            for col in columns:
+                groups[col][1].append((transformer, columns, block))
+
+    return {col: group for col, group in groups.items() if group[0] or group[1]}
+
+
+def score_permutations(estimator, scorer, X, y, columns, baseline, n_repeats, seed, X_raw=None, blocks=()):
+    rng = np.random.default_rng(seed)
+    # X в воркере - memmap только для чтения, переставленные столбцы пишутся в копию
+    X_permuted = np.array(X)
+    importances = []
+
+    for _ in range(n_repeats):
+        rows = rng.permutation(len(X))
+        X_permuted[:, columns] = X[np.ix_(rows, columns)]
+
+        # Блоки, смешивающие столбцы, пересчитываются по переставленному исходному столбцу
+        for transformer, block_columns, block, col in blocks:
+            raw = X_raw[block_columns].copy()
+            raw[col] = raw[col].to_numpy()[rows]
+            X_permuted[:, block] = transformer.transform(raw)
+
+        importances.append(baseline - scorer(estimator, X_permuted, y))
+
+    return importances
+
+
+def is_converged(importances, confidence=CONFIDENCE, rtol=RTOL, tol=0.0):
+    n = len(importances)
+
+    if n < 2:
+        return False
+
+    half_width = stats.t.ppf((1 + confidence) / 2, n - 1) * np.std(importances, ddof=1) / np.sqrt(n)
+
+    return half_width <= max(tol, rtol * abs(np.mean(importances)))
+
+
+def permutation_rounds(estimator,
+                       scorer,
+                       X,
+                       y,
+                       groups,
+                       blocks=None,
+                       X_raw=None,
+                       min_repeats=MIN_REPEATS,
+                       max_repeats=MAX_REPEATS,
+                       round_repeats=ROUND_REPEATS,
+                       confidence=CONFIDENCE,
+                       rtol=RTOL,
+                       tol=None,
+                       n_jobs=N_JOBS,
+                       random_state=None):
+    baseline = scorer(estimator, X, y)
+    tol = TOL_SHARE * abs(baseline) if tol is None else tol
+    blocks = {} if blocks is None else blocks
+
+    names = list(groups)
+    seeds = np.random.SeedSequence(random_state).spawn(len(names))
+    importances = [[] for _ in names]
+    active = list(range(len(names)))
+
+    with Parallel(n_jobs=n_jobs) as parallel:
+        while active:
+            results = parallel(
+                delayed(score_permutations)(
+                    estimator,
+                    scorer,
+                    X,
+                    y,
+                    groups[names[i]],
+                    baseline,
+                    min(round_repeats, max_repeats - len(importances[i])),
+                    seeds[i].spawn(1)[0],
+                    X_raw,
+                    blocks.get(names[i], ())
+                )
+                for i in active
+            )
+
+            for i, values in zip(active, results):
+                importances[i].extend(values)
+
+            active = [
+                i for i in active
+                if len(importances[i]) < max_repeats and (
+                    len(importances[i]) < min_repeats
+                    or not is_converged(importances[i], confidence, rtol, tol)
+                )
+            ]
+
+    n_repeats = np.array([len(values) for values in importances])
+    padded = np.full((len(names), n_repeats.max()), np.nan)
+
+    for i, values in enumerate(importances):
+        padded[i, :len(values)] = values
+
+    return Bunch(
+        importances_mean=np.nanmean(padded, axis=1),
+        importances_std=np.nanstd(padded, axis=1),
+        importances=padded,
+        n_repeats=n_repeats,
+        feature_names=names
+    )
+
+
+def permutation_importance(estimator, X, y, scoring=None, groups=None, **params):
+    '''
+    Пермутационная важность столбцов (или групп столбцов) X
+
+    groups - словарь {имя: [номера столбцов]} (None - каждый столбец отдельно).
+    Каждая группа повторяется не меньше min_repeats и не больше max_repeats
+    раз, раундами по round_repeats, пока половина доверительного интервала
+    (confidence) важности больше max(tol, rtol * |важность|)
+
+    Возвращает Bunch как sklearn: importances_mean, importances_std,
+    importances (группы × повторы, NaN для невыполненных повторов), а также
+    n_repeats и feature_names (имена групп)
+    '''
+
+    X = np.asarray(X)
+
+    if groups is None:
+        groups = {i: [i] for i in range(X.shape[1])}
+
+    return permutation_rounds(estimator, check_scoring(estimator, scoring=scoring), X, y, groups, **params)
+
+
+def pipeline_permutation_importance(pipeline, X, y, scoring=None, **params):
+    '''
+    Пермутационная важность исходных столбцов X для пайплайна
+    preprocessor -> model. Препроцессор применяется к X один раз, параметры и
+    результат - как у permutation_importance, feature_names - исходные столбцы
+    '''
+
+    preprocessor = pipeline.named_steps.preprocessor
+    model = pipeline.named_steps.model
+    raw_groups = get_raw_groups(preprocessor)
+
+    groups = {col: outputs for col, (outputs, _) in raw_groups.items()}
+    blocks = {
+        col: [(transformer, columns, block, col) for transformer, columns, block in col_blocks]
+        for col, (_, col_blocks) in raw_groups.items()
+    }
+    # Исходные значения нужны воркерам только для пересчитываемых блоков
+    raw_columns = sorted({c for col_blocks in blocks.values() for _, columns, _, _ in col_blocks for c in columns})
+
+    return permutation_rounds(
+        model,
+        check_scoring(model, scoring=scoring),
+        np.asarray(preprocessor.transform(X)),
+        y,
+        groups,
+        blocks,
+        X[raw_columns] if raw_columns else None,
+        **params
+    )
@@ -0,0 +1,375 @@
+'''
+Построение пайплайнов, пространств поиска гиперпараметров и метрик для задач
+предсказания удовлетворенности (reg) и увольнения (clf)
+'''
+
+import functools
+
+import numpy as np
+
+from joblib import Memory
+from optuna.distributions import (
+    CategoricalDistribution,
+    IntDistribution,
+    FloatDistribution
+)
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.kernel_approximation import (
+    Nystroem,
+    RBFSampler
+)
+from sklearn.linear_model import (
+    LogisticRegression,
+    LinearRegression
+)
+from sklearn.metrics import make_scorer
+from sklearn.neighbors import (
+    KNeighborsClassifier,
+    KNeighborsRegressor
+)
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import (
+    MinMaxScaler,
+    OneHotEncoder,
+    OrdinalEncoder,
+    PolynomialFeatures,
+    RobustScaler,
+    StandardScaler
+)
+from sklearn.svm import (
+    LinearSVC,
+    LinearSVR,
+    SVR,
+    SVC
+)
+from sklearn.tree import (
+    DecisionTreeRegressor,
+    DecisionTreeClassifier
+)
+
+RANDOM_STATE = 42
+
+# Лимит итераций libsvm: без него SVC с линейным ядром на немасштабированных
+# признаках (scaler 'passthrough') не сходится и обучение не завершается
+SVM_MAX_ITER = 1_000_000
+
+
+def smape_score(y_true, y_pred):
+    '''
+    Вычисляет симметричную среднюю абсолютную процентную ошибку (SMAPE) между истинными и предсказанными значениями
+
+    SMAPE (Symmetric Mean Absolute Percentage Error) — это показатель качества регрессионных моделей,
+    измеряющий среднее значение относительной ошибки между предсказанными и реальными значениями,
+    выраженное в процентах. Формула SMAPE симметрична и устойчива к нулевым значениям
+
+    Формула: SMAPE = mean( |y_pred - y_true| / ((|y_true| + |y_pred|) / 2) ) * 100
+    '''
+
+    epsilon = 1e-12  # Защита от деления на ноль
+    numerator = np.abs(y_pred - y_true)
+    denominator = (np.abs(y_true) + np.abs(y_pred) + epsilon) / 2
+    smape_result = np.mean(numerator / denominator) * 100
+
+    return smape_result
+
+# Инициализация оценщика SMAPE
+smape_scorer = make_scorer(smape_score, greater_is_better=False)
+
+
+def build_kernel_approx_model(task, kernel_approx='nystroem', n_components=300):
+    '''
+    Приближение RBF-ядра SVR/SVC: явное отображение признаков (Nystroem или
+    случайные признаки Фурье) и линейная SVM поверх него
+
+    Обучение линейно по кол-ву строк, а предсказание стоит константу на строку,
+    тогда как точные SVR/SVC обучаются за O(n²)–O(n³) и хранят опорные векторы
+    '''
+
+    if kernel_approx == 'nystroem':
+        kernel = Nystroem(kernel='rbf', n_components=n_components, random_state=RANDOM_STATE)
+    elif kernel_approx == 'rff':
+        kernel = RBFSampler(n_components=n_components, random_state=RANDOM_STATE)
+    else:
+        raise ValueError(f'Некорректное значение kernel_approx: "{kernel_approx}". Доступны "nystroem" и "rff"')
+
+    if task == 'reg':
+        linear = LinearSVR(epsilon=0.1, max_iter=5000, random_state=RANDOM_STATE)
+    elif task == 'clf':
+        linear = LinearSVC(class_weight='balanced', max_iter=5000, random_state=RANDOM_STATE)
+
+    return Pipeline([
+        ('kernel', kernel),
+        ('linear', linear)
+    ])
+
+
+def get_rbf_params(model, X):
+    '''
+    gamma и C RBF-ядра модели: точной SVR/SVC с kernel='rbf' или приближения
+    ядра (build_kernel_approx_model). gamma 'scale'/'auto' вычисляется по
+    предобработанным признакам X, как в libsvm
+
+    Для остальных моделей - ValueError: подставлять значения по умолчанию нельзя,
+    сравнение с точной моделью потеряет смысл
+    '''
+
+    # Откалиброванная модель - по исходной
+    model = getattr(model, 'estimator', model)
+
+    if isinstance(model, (SVR, SVC)) and model.kernel == 'rbf':
+        gamma, C = model.gamma, model.C
+    elif (
+        isinstance(model, Pipeline)
+        and isinstance(model.named_steps.get('kernel'), (Nystroem, RBFSampler))
+        and getattr(model.named_steps.kernel, 'kernel', 'rbf') == 'rbf'
+    ):
+        gamma, C = model.named_steps.kernel.gamma, model.named_steps.linear.C
+    else:
+        raise ValueError(f'Модель {model!r} не является SVM с RBF-ядром или его приближением')
+
+    if gamma == 'scale':
+        gamma = 1 / (X.shape[1] * X.var())
+    elif gamma in ('auto', None):
+        gamma = 1 / X.shape[1]
+
+    return gamma, C
+
+
+def build_exact_svm_model(task, gamma, C):
+    '''
+    Точная SVR/SVC с RBF-ядром - эталон для build_kernel_approx_model с теми же gamma и C
+    '''
+
+    if task == 'reg':
+        return SVR(kernel='rbf', gamma=gamma, C=C, max_iter=SVM_MAX_ITER)
+    elif task == 'clf':
+        return SVC(kernel='rbf', gamma=gamma, C=C, class_weight='balanced', max_iter=SVM_MAX_ITER, random_state=RANDOM_STATE)
+
+
+class BoundedMemory(Memory):
+    '''
+    joblib.Memory с ограничением размера на диске: после каждого вызова
+    кэшированной функции давно не использованные записи вытесняются до
+    bytes_limit (reduce_size). Ограничение действует и во время поиска, в
+    каждом воркере, а не только после него
+    '''
+
+    def __init__(self, location=None, bytes_limit=None, **params):
+        super().__init__(location, **params)
+        self.bytes_limit = bytes_limit
+
+    def cache(self, func=None, **params):
+        cached = super().cache(func, **params)
+
+        if func is None or self.store_backend is None or self.bytes_limit is None:
+            return cached
+
+        @functools.wraps(func)
+        def bounded(*args, **kwargs):
+            result = cached(*args, **kwargs)
+            self.reduce_size(bytes_limit=self.bytes_limit)
+
+            return result
+
+        return bounded
+
+
+def build_pipeline(task,
+                   ohe_columns,
+                   ord_columns,
+                   num_columns,
+                   ord_categories,
+                   model=None,
+                   num_scaler=None,
+                   poly_degree=None,
+                   memory=None,
+                   kernel_approx=None):
+
+    if model is None:
+        if kernel_approx is not None:
+            model = build_kernel_approx_model(task, kernel_approx)
+        elif task == 'reg':
+            model = DecisionTreeRegressor(random_state=RANDOM_STATE)
+        elif task == 'clf':
+            model = DecisionTreeClassifier(random_state=RANDOM_STATE)
+
+    ohe_pipe = Pipeline([
+        ('imputer_ohe', SimpleImputer(missing_values=np.nan, strategy='most_frequent')),
+        ('ohe', OneHotEncoder(drop='first', handle_unknown='ignore', sparse_output=False))
+    ])
+
+    ord_pipe = Pipeline([
+        ('imputer_before_ord', SimpleImputer(missing_values=np.nan, strategy='most_frequent')),
+        ('ord', OrdinalEncoder(categories=ord_categories, handle_unknown='use_encoded_value', unknown_value=-1)),
+        ('imputer_after_ord', SimpleImputer(missing_values=np.nan, strategy='most_frequent'))
+    ])
+
+    if poly_degree is None or poly_degree == 1:
+        num_pipe = Pipeline([
+            ('scaler', num_scaler)
+        ])
+    else:
+        num_pipe = Pipeline([
+            ('scaler', num_scaler),
+            ('poly', PolynomialFeatures(degree=poly_degree))
+        ])
+
+    preprocessor = ColumnTransformer([
+        ('ohe', ohe_pipe, ohe_columns),
+        ('ord', ord_pipe, ord_columns),
+        ('num', num_pipe, num_columns)
+    ], remainder='passthrough')
+
+    # При заданном memory препроцессор обучается один раз на пару (фолд, параметры),
+    # а повторные обучения с теми же данными и параметрами берутся из кэша
+    pipeline = Pipeline([
+        ('preprocessor', preprocessor),
+        ('model', model)
+    ], memory=memory)
+
+    return pipeline
+
+
+def construct_param_grid_sklearn(task, preprocessor_num=None, svc_probability=False):
+    if preprocessor_num is None:
+        preprocessor_num = [StandardScaler(), MinMaxScaler(), RobustScaler(), 'passthrough']
+
+    if task == 'reg':
+        return [
+            {
+                'model': [DecisionTreeRegressor(random_state=RANDOM_STATE)],
+                'model__max_depth': np.arange(2, 5),
+                'model__max_features': np.arange(2, 5),
+                'preprocessor__num__scaler': preprocessor_num
+            },
+            {
+                'model': [KNeighborsRegressor()],
+                'model__n_neighbors': np.arange(2, 8),
+                'preprocessor__num__scaler': preprocessor_num
+            },
+            {
+                'model': [SVR(max_iter=SVM_MAX_ITER)],
+                'model__C': [0.1, 1, 10],
+                'preprocessor__num__scaler': preprocessor_num
+            },
+            {
+                'model': [LinearRegression()],
+                'model__fit_intercept': [True, False],
+                'preprocessor__num__scaler': preprocessor_num
+            },
+            {
+                'model': [build_kernel_approx_model('reg')],
+                'model__kernel__gamma': [0.01, 0.05, 0.1, 0.5],
+                'model__linear__C': [0.1, 1, 10],
+                'preprocessor__num__scaler': preprocessor_num
+            }
+        ]
+    elif task == 'clf':
+        return [
+            {
+                'model': [LogisticRegression(class_weight='balanced', solver='liblinear', penalty='l1', random_state=RANDOM_STATE)],
+                'model__C': np.arange(2, 11),
+                'preprocessor__num__scaler': preprocessor_num
+            },
+            {
+                'model': [DecisionTreeClassifier(class_weight='balanced', random_state=RANDOM_STATE)],
+                'model__max_depth': np.arange(1, 6),
+                'model__max_features': np.arange(1, 6),
+                'preprocessor__num__scaler': preprocessor_num
+            },
+            {
+                'model': [KNeighborsClassifier(n_neighbors=7)],
+                'model__n_neighbors': np.arange(2, 11),
+                'preprocessor__num__scaler': preprocessor_num
+            },
+            {
+                'model': [SVC(class_weight='balanced', probability=svc_probability, max_iter=SVM_MAX_ITER, random_state=RANDOM_STATE)],
+                'model__C': [0.001, 0.01, 0.1, 1, 10, 100],
+                'model__kernel': ['linear', 'rbf'],
+                'model__gamma': ['scale', 'auto'],
+                'preprocessor__num__scaler': preprocessor_num
+            },
+            {
+                'model': [build_kernel_approx_model('clf')],
+                'model__kernel__gamma': [0.01, 0.05, 0.1, 0.5],
+                'model__linear__C': [0.01, 0.1, 1, 10],
+                'preprocessor__num__scaler': preprocessor_num
+            }
+        ]
+    else:
+        # В ноутбуке здесь выводилось сообщение и возвращался None, который затем падал в поиске
+        raise ValueError(f'Некорректное значение task: "{task}". Доступны "reg" и "clf"')
+
+
+def construct_param_grid_optuna(task, preprocessor_num=None, svc_probability=False):
+    if preprocessor_num is None:
+        preprocessor_num = [StandardScaler(), MinMaxScaler(), RobustScaler(), 'passthrough']
+
+    if task == 'reg':
+        return {
+            'knn': {
+                'model': CategoricalDistribution([KNeighborsRegressor()]),
+                'model__n_neighbors': IntDistribution(2, 7),
+                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
+            },
+            'decision_tree': {
+                'model': CategoricalDistribution([DecisionTreeRegressor(random_state=RANDOM_STATE)]),
+                'model__max_depth': IntDistribution(2, 7),
+                'model__min_samples_split': IntDistribution(2, 5),
+                'model__min_samples_leaf': IntDistribution(2, 5),
+                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
+            },
+            'linreg': {
+                'model': CategoricalDistribution([LinearRegression()]),
+                'model__fit_intercept': CategoricalDistribution([True, False]),
+                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
+            },
+            'svr': {
+                'model': CategoricalDistribution([SVR(max_iter=SVM_MAX_ITER)]),
+                'model__kernel': CategoricalDistribution(['rbf', 'sigmoid', 'poly']),
+                'model__C': FloatDistribution(0.01, 10, log=True),
+                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
+            },
+            'nystroem_svr': {
+                'model': CategoricalDistribution([build_kernel_approx_model('reg')]),
+                'model__kernel__gamma': FloatDistribution(0.001, 1, log=True),
+                'model__linear__C': FloatDistribution(0.01, 10, log=True),
+                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
+            }
+        }
+    elif task == 'clf':
+        return {
+            'knn': {
+                'model': CategoricalDistribution([KNeighborsClassifier()]),
+                'model__n_neighbors': IntDistribution(2, 7),
+                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
+            },
+            'decision_tree': {
+                'model': CategoricalDistribution([DecisionTreeClassifier(class_weight='balanced', random_state=RANDOM_STATE)]),
+                'model__max_depth': IntDistribution(2, 7),
+                'model__min_samples_split': IntDistribution(2, 5),
+                'model__min_samples_leaf': IntDistribution(2, 5),
+                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
+            },
+            'logreg': {
+                'model': CategoricalDistribution([LogisticRegression(class_weight='balanced', random_state=RANDOM_STATE)]),
+                'model__C': FloatDistribution(0.01, 10, log=True),
+                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
+            },
+            'svc': {
+                'model': CategoricalDistribution([SVC(class_weight='balanced', probability=svc_probability, max_iter=SVM_MAX_ITER, random_state=RANDOM_STATE)]),
+                'model__kernel': CategoricalDistribution(['rbf', 'sigmoid', 'poly']),
+                'model__C': FloatDistribution(0.01, 10, log=True),
+                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
+            },
+            'nystroem_svc': {
+                'model': CategoricalDistribution([build_kernel_approx_model('clf')]),
+                'model__kernel__gamma': FloatDistribution(0.001, 1, log=True),
+                'model__linear__C': FloatDistribution(0.01, 10, log=True),
+                'preprocessor__num__scaler': CategoricalDistribution(preprocessor_num)
+            }
+        }
+    else:
+        # В ноутбуке здесь выводилось сообщение и возвращался None, который затем падал в поиске
+        raise ValueError(f'Некорректное значение task: "{task}". Доступны "reg" и "clf"')
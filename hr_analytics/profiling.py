@@ -0,0 +1,327 @@
+'''
+Профилирование таблиц для обзора данных в ноутбуке
+
+Все статистики столбца (пропуски, уникальные значения, describe) считаются
+за один проход: pd.factorize дает коды и уникальные значения, np.bincount по
+кодам - частоты, а среднее, std и квантили числового столбца считаются по
+отсортированным уникальным значениям с их частотами. Столбцы профилируются
+параллельно в потоках, результат кэшируется по хэшу содержимого таблицы,
+поэтому повторные обзоры той же таблицы не пересчитываются
+
+Для очень больших таблиц есть приближенный режим (approx=True): таблица
+делится на чанки, по каждому столбцу чанка строятся сливаемые скетчи
+(hr_analytics.sketches), чанки обрабатываются параллельно и сливаются.
+Кол-во уникальных значений, квартили и частые значения оцениваются с
+ошибкой, которая выводится рядом со статистикой; пропуски, среднее, std,
+min и max считаются точно
+'''
+
+import hashlib
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from joblib import Parallel, delayed
+
+from hr_analytics.sketches import HyperLogLog, KLLSketch, MisraGries
+
+PERCENTILES = [0.25, 0.5, 0.75]
+DESCRIBE_INDEX = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+CACHE_SIZE = 32
+
+# Приближенный режим: строк в чанке и кол-во выводимых частых значений
+APPROX_CHUNKSIZE = 250_000
+TOP_K = 10
+
+_cache = OrderedDict()
+
+
+class FrameProfile:
+    '''
+    Профиль таблицы
+
+    columns - статистики по столбцам (dtype, non_null, missing, missing_pct,
+    unique, values), describe - как df.describe() для числовых столбцов.
+    В приближенном режиме columns дополнительно содержит unique_error
+    (относительная ошибка unique) и values_error (на сколько могут быть
+    занижены частоты values), а describe - строку rank_error (ошибка
+    квартилей по рангу)
+    '''
+
+    def __init__(self, columns, describe, n_rows, index_duplicates, memory_usage):
+        self.columns = columns
+        self.describe = describe
+        self.n_rows = n_rows
+        self.index_duplicates = index_duplicates
+        self.memory_usage = memory_usage
+
+
+def is_numeric(dtype):
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def _quantile(sorted_values, cumcounts, q):
+    # Линейная интерполяция между порядковыми статистиками, как в pd.Series.quantile
+    position = q * (cumcounts[-1] - 1)
+    lower, upper = int(np.floor(position)), int(np.ceil(position))
+    lower_value = sorted_values[np.searchsorted(cumcounts, lower, side='right')]
+    upper_value = sorted_values[np.searchsorted(cumcounts, upper, side='right')]
+
+    return lower_value + (upper_value - lower_value) * (position - lower)
+
+
+def describe_counts(uniques, counts):
+    '''
+    Статистики df.describe() по уникальным значениям и их частотам
+    '''
+
+    order = np.argsort(uniques)
+    values = uniques[order].astype(float)
+    counts = counts[order]
+    cumcounts = np.cumsum(counts)
+    n = cumcounts[-1] if len(cumcounts) else 0
+
+    if n == 0:
+        return pd.Series([0] + [np.nan] * 7, index=DESCRIBE_INDEX, dtype=float)
+
+    mean = (values * counts).sum() / n
+    std = np.sqrt(((values - mean) ** 2 * counts).sum() / (n - 1)) if n > 1 else np.nan
+
+    return pd.Series(
+        [n, mean, std, values[0], *[_quantile(values, cumcounts, q) for q in PERCENTILES], values[-1]],
+        index=DESCRIBE_INDEX,
+        dtype=float
+    )
+
+
+def profile_column(values):
+    codes, uniques = pd.factorize(values)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    non_null = int(counts.sum())
+    missing = len(values) - non_null
+
+    # Уникальные значения в порядке появления, как в Series.unique()
+    unique_values = np.asarray(uniques, dtype=object)
+
+    if missing:
+        unique_values = np.append(unique_values, np.nan)
+
+    stats = {
+        'dtype': values.dtype,
+        'non_null': non_null,
+        'missing': missing,
+        'missing_pct': round(missing / len(values) * 100, 2) if len(values) else 0.0,
+        'unique': len(uniques),
+        'values': unique_values,
+    }
+
+    describe = None
+
+    if is_numeric(values.dtype):
+        describe = describe_counts(np.asarray(uniques), counts)
+
+    return stats, describe
+
+
+class ColumnSketch:
+    '''
+    Сливаемая сводка столбца: точные счетчики и моменты, HyperLogLog для
+    уникальных значений, Misra-Gries для частых значений и KLL для квантилей
+    числовых столбцов
+    '''
+
+    def __init__(self, dtype, random_state=None):
+        self.dtype = dtype
+        self.n = 0
+        self.non_null = 0
+        self.distinct = HyperLogLog()
+        self.frequent = MisraGries()
+        self.numeric = is_numeric(dtype)
+
+        if self.numeric:
+            self.mean = 0.0
+            self.m2 = 0.0
+            self.min = np.inf
+            self.max = -np.inf
+            self.quantiles = KLLSketch(random_state=random_state)
+
+    def _merge_moments(self, n, mean, m2):
+        # Слияние среднего и суммы квадратов отклонений (Chan et al.)
+        total = self.non_null + n
+
+        if n:
+            delta = mean - self.mean
+            self.m2 += m2 + delta ** 2 * self.non_null * n / total
+            self.mean += delta * n / total
+
+    def update(self, values):
+        # Скетчи уникальных и частых значений обновляются по словарю чанка:
+        # HyperLogLog не зависит от повторов, частоты считаются по кодам
+        codes, uniques = pd.factorize(values)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        non_null = int(counts.sum())
+
+        self.distinct.update(uniques, distinct=True)
+        self.frequent.update_counts(pd.Series(counts, index=uniques))
+
+        if self.numeric and non_null:
+            numbers = values.dropna().to_numpy(dtype=float)
+            mean = numbers.mean()
+
+            self._merge_moments(non_null, mean, ((numbers - mean) ** 2).sum())
+            self.min = min(self.min, numbers.min())
+            self.max = max(self.max, numbers.max())
+            self.quantiles.update(numbers)
+
+        self.n += len(values)
+        self.non_null += non_null
+
+        return self
+
+    def merge(self, other):
+        self.distinct.merge(other.distinct)
+        self.frequent.merge(other.frequent)
+
+        if self.numeric:
+            self._merge_moments(other.non_null, other.mean, other.m2)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.quantiles.merge(other.quantiles)
+
+        self.n += other.n
+        self.non_null += other.non_null
+
+        return self
+
+    def stats(self):
+        missing = self.n - self.non_null
+        top = self.frequent.top(TOP_K)
+
+        return {
+            'dtype': self.dtype,
+            'non_null': self.non_null,
+            'missing': missing,
+            'missing_pct': round(missing / self.n * 100, 2) if self.n else 0.0,
+            'unique': int(round(self.distinct.estimate())),
+            'unique_error': self.distinct.relative_error,
+            'values': np.asarray(top.index, dtype=object),
+            'values_error': self.frequent.error,
+        }
+
+    def describe(self):
+        if not self.numeric:
+            return None
+
+        n = self.non_null
+
+        if n == 0:
+            quartiles = [np.nan] * len(PERCENTILES)
+        else:
+            quartiles = list(self.quantiles.quantile(PERCENTILES))
+
+        return pd.Series(
+            [
+                n,
+                self.mean if n else np.nan,
+                np.sqrt(self.m2 / (n - 1)) if n > 1 else np.nan,
+                self.min if n else np.nan,
+                *quartiles,
+                self.max if n else np.nan,
+                self.quantiles.rank_error,
+            ],
+            index=[*DESCRIBE_INDEX, 'rank_error'],
+            dtype=float
+        )
+
+
+def sketch_chunk(chunk, seed):
+    # seed - SeedSequence чанка, каждый столбец получает свой генератор
+    seeds = seed.spawn(chunk.shape[1])
+
+    return [ColumnSketch(chunk[col].dtype, seed).update(chunk[col]) for col, seed in zip(chunk.columns, seeds)]
+
+
+def _profile_exact(df, n_jobs):
+    results = Parallel(n_jobs=n_jobs, prefer='threads')(
+        delayed(profile_column)(df[col]) for col in df.columns
+    )
+
+    return [stats for stats, _ in results], [describe for _, describe in results]
+
+
+def _profile_approx(df, n_jobs, chunksize, random_state):
+    starts = range(0, max(len(df), 1), chunksize)
+    seeds = np.random.SeedSequence(random_state).spawn(len(starts))
+
+    chunk_sketches = Parallel(n_jobs=n_jobs, prefer='threads')(
+        delayed(sketch_chunk)(df.iloc[start:start + chunksize], seed) for start, seed in zip(starts, seeds)
+    )
+
+    sketches = chunk_sketches[0]
+
+    for other in chunk_sketches[1:]:
+        for sketch, other_sketch in zip(sketches, other):
+            sketch.merge(other_sketch)
+
+    return [sketch.stats() for sketch in sketches], [sketch.describe() for sketch in sketches]
+
+
+def frame_hash(df):
+    '''
+    Хэш содержимого таблицы: значения, индекс, имена и типы столбцов
+    '''
+
+    digest = hashlib.md5(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    digest.update(repr((list(df.columns), list(df.dtypes.astype(str)))).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def profile_frame(df,
+                  n_jobs=None,
+                  use_cache=True,
+                  approx=False,
+                  chunksize=APPROX_CHUNKSIZE,
+                  random_state=None):
+    '''
+    Профилирует все столбцы df за один проход по каждому столбцу
+
+    n_jobs - кол-во потоков (None - последовательно): по столбцам, а в
+    приближенном режиме (approx=True) - по чанкам из chunksize строк.
+    Результат кэшируется по frame_hash, изменение таблицы дает новый ключ
+    '''
+
+    key = (frame_hash(df), approx, chunksize if approx else None) if use_cache else None
+
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    if approx:
+        stats, describes = _profile_approx(df, n_jobs, chunksize, random_state)
+    else:
+        stats, describes = _profile_exact(df, n_jobs)
+
+    columns = pd.DataFrame(stats, index=df.columns)
+    describe = pd.DataFrame(
+        {col: describe for col, describe in zip(df.columns, describes) if describe is not None}
+    )
+
+    profile = FrameProfile(
+        columns=columns,
+        describe=describe,
+        n_rows=len(df),
+        index_duplicates=int(df.index.duplicated().sum()),
+        memory_usage=int(df.memory_usage(deep=False).sum())
+    )
+
+    if use_cache:
+        _cache[key] = profile
+
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return profile
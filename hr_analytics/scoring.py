@@ -0,0 +1,60 @@
+'''
+Пакетный скоринг сотрудников двухэтапной моделью: сначала предсказывается
+удовлетворенность (jsr_predict), затем по ней и признакам - вероятность
+увольнения (quit_predict)
+'''
+
+import pandas as pd
+
+from hr_analytics.data import VALUE_TYPOS, rename_values, text_vals_to_nan
+
+MODELS_DIR = 'models'
+
+# Пороги сегмента высокого риска: низкая удовлетворенность и высокая вероятность увольнения
+JSR_RISK_THRESHOLD = 0.4
+QUIT_RISK_THRESHOLD = 0.6
+
+CHUNKSIZE = 100_000
+
+
+def clean_chunk(chunk):
+    # Те же шаги, что и при предобработке в ноутбуке
+    return rename_values(text_vals_to_nan(chunk), VALUE_TYPOS)
+
+
+def score_frame(df, jsr_pipeline, quit_pipeline):
+    X = df[jsr_pipeline.feature_names_in_]
+    jsr_predict = jsr_pipeline.predict(X)
+
+    X_quit = X.assign(jsr_predict=jsr_predict)[quit_pipeline.feature_names_in_]
+    quit_predict = quit_pipeline.predict_proba(X_quit)[:, 1]
+
+    return pd.DataFrame(
+        data={
+            'jsr_predict': jsr_predict,
+            'quit_predict': quit_predict,
+            'high_risk': (jsr_predict <= JSR_RISK_THRESHOLD) & (quit_predict >= QUIT_RISK_THRESHOLD),
+        },
+        index=df.index
+    )
+
+
+def score_csv(input_path, output_path, jsr_pipeline, quit_pipeline, chunksize=CHUNKSIZE, **read_params):
+    '''
+    Построчно читает CSV с признаками сотрудников фиксированными чанками, оценивает
+    каждый чанк одним векторизованным вызовом моделей и сразу дописывает результат
+    в output_path, поэтому в памяти одновременно находится только один чанк
+
+    Возвращает кол-во оцененных строк
+    '''
+
+    read_params = {'index_col': 'id', **read_params}
+    n_rows = 0
+
+    with pd.read_csv(input_path, chunksize=chunksize, **read_params) as reader:
+        for i, chunk in enumerate(reader):
+            scores = score_frame(clean_chunk(chunk), jsr_pipeline, quit_pipeline)
+            scores.to_csv(output_path, mode='w' if i == 0 else 'a', header=i == 0)
+            n_rows += len(scores)
+
+    return n_rows
@@ -0,0 +1,418 @@
+'''
+Поиск лучшей модели по нескольким семействам моделей
+
+Все обучения (семейство модели × кандидат × фолд CV) планируются как один
+плоский граф задач в общем пуле процессов, вместо последовательного обхода
+словарей параметров
+'''
+
+import time
+
+import numpy as np
+import optuna
+
+from joblib import Parallel, delayed, effective_n_jobs, parallel_config
+from optuna.distributions import (
+    CategoricalDistribution,
+    IntDistribution,
+    FloatDistribution
+)
+from optuna.integration import OptunaSearchCV
+from sklearn.base import clone, is_classifier
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import (
+    GridSearchCV,
+    HalvingGridSearchCV,
+    ParameterSampler,
+    RandomizedSearchCV,
+    check_cv
+)
+from sklearn.pipeline import Pipeline
+from sklearn.utils import _safe_indexing
+from tqdm_joblib import tqdm_joblib
+
+
+def get_pruner(pruner, n_splits):
+    if pruner == 'median':
+        # Trial останавливается, если после очередного фолда он хуже медианы предыдущих
+        return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=1)
+
+    if pruner == 'hyperband':
+        # Ресурс trial'а - кол-во пройденных фолдов CV
+        return optuna.pruners.HyperbandPruner(min_resource=1, max_resource=n_splits)
+
+    raise ValueError(f'Некорректное значение pruner: "{pruner}". Доступны "median" и "hyperband"')
+
+
+def get_searcher(final_pipeline,
+                 param_grid,
+                 search_method,
+                 scoring=None,
+                 cv=None,
+                 n_jobs=1,
+                 random_state=None):
+
+    if search_method == 'randomized':
+        return RandomizedSearchCV(
+            final_pipeline,
+            param_grid,
+            scoring=scoring,
+            n_iter=20,
+            n_jobs=n_jobs,
+            verbose=0,
+            cv=cv,
+            random_state=random_state,
+        )
+
+    if search_method == 'optuna':
+        return OptunaSearchCV(
+            final_pipeline,
+            param_grid,
+            cv=cv,
+            scoring=scoring,
+            n_trials=40,
+            n_jobs=n_jobs,
+            verbose=1,
+            error_score='raise',
+            random_state=random_state
+        )
+
+
+def _suggest(trial, name, dist):
+    if isinstance(dist, CategoricalDistribution):
+        return trial.suggest_categorical(name, dist.choices)
+
+    if isinstance(dist, IntDistribution):
+        return trial.suggest_int(name, dist.low, dist.high, step=dist.step, log=dist.log)
+
+    if isinstance(dist, FloatDistribution):
+        return trial.suggest_float(name, dist.low, dist.high, step=dist.step, log=dist.log)
+
+    raise TypeError(f'Неподдерживаемое распределение для {name}: {dist}')
+
+
+class PrunedOptunaSearchCV:
+    '''
+    Поиск Optuna с поэтапной кросс-валидацией: после каждого фолда trial сообщает
+    промежуточную оценку, и pruner останавливает заведомо слабые кандидаты, не
+    дожидаясь обучения на оставшихся фолдах. n_jobs trial'ов выполняются
+    параллельно в потоках study.optimize
+
+    Повторяет атрибуты OptunaSearchCV, которые используются при сравнении моделей
+    '''
+
+    def __init__(self,
+                 estimator,
+                 param_distributions,
+                 scoring=None,
+                 cv=None,
+                 n_trials=40,
+                 pruner='median',
+                 n_jobs=1,
+                 random_state=None):
+
+        self.estimator = estimator
+        self.param_distributions = param_distributions
+        self.scoring = scoring
+        self.cv = cv
+        self.n_trials = n_trials
+        self.pruner = pruner
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def _objective(self, trial, X, y, scorer, folds):
+        # Модели-варианты из распределений общие для всех trial'ов, а set_params меняет
+        # их на месте, поэтому каждый trial получает свои копии
+        params = {
+            name: clone(_suggest(trial, name, dist), safe=False)
+            for name, dist in self.param_distributions.items()
+        }
+
+        scores = []
+        score_times = []
+
+        for step, (train_idx, test_idx) in enumerate(folds):
+            estimator = clone(self.estimator).set_params(**params)
+            estimator.fit(_safe_indexing(X, train_idx), _safe_indexing(y, train_idx))
+
+            start = time.perf_counter()
+            scores.append(scorer(estimator, _safe_indexing(X, test_idx), _safe_indexing(y, test_idx)))
+            score_times.append(time.perf_counter() - start)
+
+            trial.set_user_attr('mean_score_time', float(np.mean(score_times)))
+            trial.report(float(np.mean(scores)), step)
+
+            if trial.should_prune():
+                raise optuna.TrialPruned()
+
+        return float(np.mean(scores))
+
+    def fit(self, X, y):
+        scorer = check_scoring(self.estimator, scoring=self.scoring)
+        folds = list(check_cv(self.cv, y, classifier=is_classifier(self.estimator)).split(X, y))
+
+        self.study_ = optuna.create_study(
+            direction='maximize',
+            sampler=optuna.samplers.TPESampler(seed=self.random_state),
+            pruner=get_pruner(self.pruner, len(folds))
+        )
+
+        self.study_.optimize(
+            lambda trial: self._objective(trial, X, y, scorer, folds),
+            n_trials=self.n_trials,
+            n_jobs=self.n_jobs
+        )
+
+        self.best_index_ = self.study_.best_trial.number
+        self.best_params_ = self.study_.best_params
+        self.best_score_ = self.study_.best_value
+        self.cv_results_ = {
+            'mean_score_time': [trial.user_attrs.get('mean_score_time', np.nan) for trial in self.study_.trials],
+            'state': [trial.state.name for trial in self.study_.trials],
+        }
+
+        start = time.perf_counter()
+        self.best_estimator_ = clone(clone(self.estimator).set_params(**self.best_params_)).fit(X, y)
+        self.refit_time_ = time.perf_counter() - start
+
+        return self
+
+
+def get_model_name(params):
+    model = params['model']
+
+    # В словарях Optuna модель обернута в CategoricalDistribution
+    if hasattr(model, 'choices'):
+        model = model.choices[0]
+    elif isinstance(model, list):
+        model = model[0]
+
+    # Составные модели (например, приближение ядра + линейная модель) именуются по шагам
+    if isinstance(model, Pipeline):
+        return '+'.join(type(step).__name__ for _, step in model.steps)
+
+    return type(model).__name__
+
+
+def sample_candidates(param_grid, n_iter=20, random_state=None):
+    '''
+    Сэмплирует по n_iter кандидатов из каждого семейства моделей так же, как это делает
+    RandomizedSearchCV, и разворачивает их в плоский список сеток из одной точки
+    '''
+
+    candidates = []
+    families = []
+
+    for param_dist in param_grid:
+        for params in ParameterSampler(param_dist, n_iter, random_state=random_state):
+            candidates.append({key: [val] for key, val in params.items()})
+            families.append(get_model_name(param_dist))
+
+    return candidates, families
+
+
+def _fit_optuna_family(final_pipeline, dist, X, y, scoring, cv, n_jobs, pruner, random_state):
+    if pruner is None:
+        searcher = get_searcher(
+            final_pipeline,
+            dist,
+            search_method='optuna',
+            scoring=scoring,
+            cv=cv,
+            n_jobs=n_jobs,
+            random_state=random_state
+        )
+    else:
+        searcher = PrunedOptunaSearchCV(
+            final_pipeline,
+            dist,
+            scoring=scoring,
+            cv=cv,
+            pruner=pruner,
+            n_jobs=n_jobs,
+            random_state=random_state
+        )
+
+    searcher.fit(X, y)
+
+    return searcher
+
+
+def _randomized_search(final_pipeline, param_grid, X, y, scoring, cv, n_iter, n_jobs, pre_dispatch,
+                       halving, random_state, progress):
+    candidates, families = sample_candidates(param_grid, n_iter=n_iter, random_state=random_state)
+
+    if halving:
+        # Кандидаты сначала оцениваются на малых подвыборках, и только лучшая
+        # треть на каждой итерации переходит на выборку в 3 раза больше
+        searcher = HalvingGridSearchCV(
+            final_pipeline,
+            candidates,
+            scoring=scoring,
+            cv=cv,
+            factor=3,
+            resource='n_samples',
+            min_resources='exhaust',
+            n_jobs=n_jobs,
+            random_state=random_state,
+            verbose=0,
+        )
+        method = 'HSCV'
+        total = None
+    else:
+        searcher = GridSearchCV(
+            final_pipeline,
+            candidates,
+            scoring=scoring,
+            cv=cv,
+            n_jobs=n_jobs,
+            pre_dispatch=pre_dispatch,
+            verbose=0,
+        )
+        method = 'RSCV'
+        total = len(candidates) * check_cv(cv, y, classifier=is_classifier(final_pipeline)).get_n_splits(X, y)
+
+    with tqdm_joblib(total=total, desc=f'{method} Progress', disable=not progress):
+        searcher.fit(X, y)
+
+    cv_results = searcher.cv_results_
+    # У halving-поиска каждый кандидат встречается на всех пройденных им итерациях
+    n_resources = cv_results.get('n_resources', np.zeros(len(cv_results['params'])))
+    row_families = [get_model_name(params) for params in cv_results['params']]
+    results_list = []
+
+    # Лучший кандидат внутри каждого семейства моделей: сначала по размеру
+    # выборки, на которой он оценивался, затем по оценке CV
+    for family in dict.fromkeys(families):
+        idx = [i for i, name in enumerate(row_families) if name == family]
+        best_idx = max(idx, key=lambda i: (n_resources[i], cv_results['mean_test_score'][i]))
+
+        # Время обучения лучшего кандидата на всей выборке, как refit_time_ у отдельного поиска по семейству
+        if best_idx == searcher.best_index_:
+            best_model, refit_time = searcher.best_estimator_, searcher.refit_time_
+        else:
+            start = time.perf_counter()
+            best_model = clone(final_pipeline).set_params(**cv_results['params'][best_idx]).fit(X, y)
+            refit_time = time.perf_counter() - start
+
+        results_list.append({
+            'Best Model': best_model.named_steps.model,
+            'Best CV': f'{cv_results["mean_test_score"][best_idx]:.4f}',
+            'Train Time (sec.)': f'{refit_time:.2f}',
+            'Pred Time (sec.)': f'{cv_results["mean_score_time"][best_idx]:.2f}',
+            'Method': method
+        })
+
+    return results_list, searcher.best_estimator_, searcher.best_score_
+
+
+def _optuna_search(final_pipeline, param_grid, X, y, scoring, cv, n_jobs, pruner, random_state, progress):
+    dists = list(param_grid.values())
+
+    # Семейства обучаются в отдельных процессах, оставшиеся ядра делятся между trial'ами
+    family_jobs = min(effective_n_jobs(n_jobs), len(dists))
+    trial_jobs = max(1, effective_n_jobs(n_jobs) // family_jobs)
+
+    with tqdm_joblib(total=len(dists), desc='OSCV Progress', disable=not progress):
+        searchers = Parallel(n_jobs=family_jobs)(
+            delayed(_fit_optuna_family)(final_pipeline, dist, X, y, scoring, cv, trial_jobs, pruner, random_state)
+            for dist in dists
+        )
+
+    results_list = []
+    best_pipeline = None
+    best_score = float('-inf')
+
+    for searcher in searchers:
+        cv_score = searcher.best_score_
+
+        results_list.append({
+            'Best Model': f'{searcher.best_estimator_.named_steps.model}',
+            'Best CV': f'{cv_score:.4f}',
+            'Train Time (sec.)': f'{searcher.refit_time_:.2f}',
+            'Pred Time (sec.)': f'{searcher.cv_results_["mean_score_time"][searcher.best_index_]:.2f}',
+            'Method': 'OSCV'
+        })
+
+        if cv_score > best_score:
+            best_pipeline = searcher.best_estimator_
+            best_score = cv_score
+
+    return results_list, best_pipeline, best_score
+
+
+def run_search(final_pipeline,
+               param_grid,
+               search_method,
+               X,
+               y,
+               scoring=None,
+               cv=None,
+               n_iter=20,
+               n_jobs=-1,
+               max_nbytes='1M',
+               pre_dispatch='2*n_jobs',
+               pruner=None,
+               random_state=None,
+               progress=True):
+    '''
+    Запускает поиск лучшей модели сразу по всем семействам из param_grid
+
+    Для 'randomized' кандидаты всех семейств разворачиваются в одну сетку, и все пары
+    (кандидат × фолд) обучаются в одном пуле процессов. 'halving' работает так же, но
+    отсеивает кандидатов методом successive halving на растущих подвыборках, поэтому
+    за то же время можно проверить на порядок больше кандидатов (n_iter). Для 'optuna'
+    семейства обучаются параллельно, каждое в своем процессе, а при заданном pruner
+    ('median' или 'hyperband') слабые trial'ы останавливаются после первых фолдов
+
+    Память воркеров ограничивается через max_nbytes (массивы больше порога передаются
+    в процессы через memmap, а не копируются) и pre_dispatch (кол-во задач в очереди)
+
+    Возвращает список результатов по семействам, лучший пайплайн и его оценку CV
+    '''
+
+    with parallel_config(
+        backend='loky',
+        max_nbytes=max_nbytes,
+        inner_max_num_threads=1
+    ):
+        if search_method in ('randomized', 'halving'):
+            return _randomized_search(
+                final_pipeline, param_grid, X, y, scoring, cv, n_iter, n_jobs, pre_dispatch,
+                search_method == 'halving', random_state, progress
+            )
+
+        if search_method == 'optuna':
+            return _optuna_search(
+                final_pipeline, param_grid, X, y, scoring, cv, n_jobs, pruner, random_state, progress
+            )
+
+    raise ValueError(
+        f'Некорректное значение search_method: "{search_method}". Доступны "randomized", "halving" и "optuna"'
+    )
+
+
+def calibrate_pipeline(pipeline, X, y, method='sigmoid', cv=None):
+    '''
+    Добавляет вероятности финальной модели без probability=True
+
+    Модель оборачивается в CalibratedClassifierCV с ensemble=False: вероятности
+    калибруются (sigmoid или isotonic) по отложенным фолдам, а сама модель обучается
+    один раз на всех данных. Модели со своим predict_proba возвращаются как есть
+    '''
+
+    model = pipeline.named_steps.model
+
+    if hasattr(model, 'predict_proba'):
+        return pipeline
+
+    calibrated_model = CalibratedClassifierCV(
+        clone(model),
+        method=method,
+        cv=cv,
+        ensemble=False
+    )
+
+    return clone(pipeline).set_params(model=calibrated_model).fit(X, y)
@@ -0,0 +1,115 @@
+'''
+Агрегаты по сегментам сотрудников
+'''
+
+import numpy as np
+import pandas as pd
+
+# Столбцы отчета: мода считается по кодам значений, остальные - именованными агрегатами groupby
+MODE_COLUMNS = {
+    'Грейд (мода)': 'level',
+    'Оценка (мода)': 'supervisor_evaluation',
+    'Загрузка (мода)': 'workload',
+}
+
+REPORT_COLUMNS = [
+    'Сотрудники (всего)',
+    'Грейд (мода)',
+    'Зарплата (медиана)',
+    'Длительность (ср)',
+    'Оценка (мода)',
+    'Загрузка (мода)',
+    'Повышений (%)',
+    'Нарушений (%)',
+    'Удовлетворенность (ср)',
+    'Вероятность увольнения (ср)',
+]
+
+
+def get_codes(values):
+    '''
+    Коды значений (-1 для NaN) и отсортированные уникальные значения
+    '''
+
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+
+    return pd.factorize(values, sort=True)
+
+
+def group_modes(values, group_codes, n_groups):
+    '''
+    Мода values в каждой группе по частотам комбинированных кодов (группа,
+    значение). При равных частотах - меньшее значение, как Series.mode()[0]
+    '''
+
+    codes, uniques = get_codes(values)
+
+    mask = (codes >= 0) & (group_codes >= 0)
+    counts = np.bincount(
+        group_codes[mask] * len(uniques) + codes[mask],
+        minlength=n_groups * len(uniques)
+    ).reshape(n_groups, len(uniques))
+
+    if not len(uniques):
+        return np.full(n_groups, np.nan)
+
+    modes = np.asarray(uniques)[counts.argmax(axis=1)]
+    empty = counts.sum(axis=1) == 0
+
+    # Группа без значений получает NaN
+    if empty.any():
+        modes = modes.astype(object)
+        modes[empty] = np.nan
+
+    return modes
+
+
+def segment_report(df, segment, by='dept'):
+    '''
+    Агрегаты по отделам (by) сразу для всех сегментов: один groupby().agg()
+    по ключу (segment, by), моды - по кодам значений
+
+    segment - Series с меткой сегмента для каждой строки df (порядок
+    сегментов в отчете - порядок категорий, если segment категориальный).
+    Возвращает DataFrame с индексом (сегмент, отдел)
+    '''
+
+    segment_codes, segments = get_codes(segment)
+    dept_codes, depts = get_codes(df[by])
+
+    # Ключ (сегмент, отдел) одним целым кодом; строки с NaN в ключе не входят ни в одну группу
+    key = np.where(
+        (segment_codes >= 0) & (dept_codes >= 0),
+        segment_codes.astype(np.intp) * len(depts) + dept_codes,
+        -1
+    )
+
+    report = df.groupby(key).agg(**{
+        'Сотрудники (всего)': ('salary', 'size'),
+        'Зарплата (медиана)': ('salary', 'median'),
+        'Длительность (ср)': ('employment_years', 'mean'),
+        'Повышений (%)': ('last_year_promo_yes', 'mean'),
+        'Нарушений (%)': ('last_year_violations_yes', 'mean'),
+        'Удовлетворенность (ср)': ('jsr_predict', 'mean'),
+        'Вероятность увольнения (ср)': ('quit_predict', 'mean'),
+    }).drop(index=-1, errors='ignore')
+
+    keys = report.index.to_numpy()
+    group_codes = np.where(key >= 0, np.searchsorted(keys, key), -1)
+
+    for name, col in MODE_COLUMNS.items():
+        report[name] = group_modes(df[col], group_codes, len(report))
+
+    report.index = pd.MultiIndex.from_arrays(
+        [segments.take(keys // len(depts)), depts.take(keys % len(depts))],
+        names=[segment.name, by]
+    )
+
+    report['Длительность (ср)'] = report['Длительность (ср)'].round(1)
+    report['Повышений (%)'] = (report['Повышений (%)'] * 100).round(1)
+    report['Нарушений (%)'] = (report['Нарушений (%)'] * 100).round(1)
+    report['Удовлетворенность (ср)'] = report['Удовлетворенность (ср)'].round(2)
+    report['Вероятность увольнения (ср)'] = report['Вероятность увольнения (ср)'].round(2)
+
+    return report[REPORT_COLUMNS]
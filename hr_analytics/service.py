@@ -0,0 +1,231 @@
+'''
+Локальный HTTP-сервис онлайн-скоринга отдельных сотрудников
+
+Пайплайны загружаются из артефакта один раз при старте. Одновременные запросы
+собираются в микробатч (до max_batch_size записей или max_wait_ms ожидания) и
+оцениваются одним векторизованным вызовом моделей
+
+    POST /score  - запись сотрудника по схеме test_features.csv (или список записей)
+    GET  /stats  - задержки p50/p99 и размеры батчей
+    GET  /health - проверка доступности
+'''
+
+import json
+import math
+import queue
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from hr_analytics.artifacts import load_artifacts
+from hr_analytics.scoring import MODELS_DIR, clean_chunk, score_frame
+
+HOST = '127.0.0.1'
+PORT = 8000
+MAX_BATCH_SIZE = 256
+MAX_WAIT_MS = 5
+LATENCY_WINDOW = 10_000
+REQUEST_TIMEOUT = 30
+
+
+def get_numeric_columns(pipeline):
+    preprocessor = pipeline.named_steps.preprocessor
+
+    return [col for name, _, cols in preprocessor.transformers_ if name == 'num' for col in cols]
+
+
+class MicroBatcher:
+    def __init__(self, jsr_pipeline, quit_pipeline, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.jsr_pipeline = jsr_pipeline
+        self.quit_pipeline = quit_pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self.feature_names = list(jsr_pipeline.feature_names_in_)
+        self.numeric_columns = get_numeric_columns(jsr_pipeline)
+        self.scalar_columns = ['id', *(col for col in self.feature_names if col not in self.numeric_columns)]
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._batch_sizes = deque(maxlen=LATENCY_WINDOW)
+
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def validate(self, record):
+        if not isinstance(record, dict):
+            raise ValueError('Запись сотрудника должна быть JSON-объектом')
+
+        for col in self.numeric_columns:
+            if not isinstance(record.get(col), (int, float)) or isinstance(record.get(col), bool):
+                raise ValueError(f'Поле "{col}" обязательно и должно быть числом')
+
+            # json.loads пропускает Infinity и NaN, на которых модели падают
+            if isinstance(record[col], float) and not math.isfinite(record[col]):
+                raise ValueError(f'Поле "{col}" должно быть конечным числом')
+
+        # Объект или список в категориальном поле не хэшируется и ломает весь батч
+        for col in self.scalar_columns:
+            if not (record.get(col) is None or isinstance(record.get(col), (str, int, float))):
+                raise ValueError(f'Поле "{col}" должно быть строкой, числом или null')
+
+    def score(self, records, timeout=REQUEST_TIMEOUT):
+        start = time.perf_counter()
+
+        for record in records:
+            self.validate(record)
+
+        future = Future()
+        self._queue.put((records, future))
+        result = future.result(timeout=timeout)
+
+        with self._lock:
+            self._latencies.append(time.perf_counter() - start)
+
+        return result
+
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            batch_sizes = np.array(self._batch_sizes)
+
+        if len(latencies) == 0:
+            return {'requests': 0}
+
+        return {
+            'requests': len(latencies),
+            'latency_p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'latency_p99_ms': round(float(np.percentile(latencies, 99)), 3),
+            'batches': len(batch_sizes),
+            'mean_batch_size': round(float(batch_sizes.mean()), 2),
+        }
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            n_records = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_wait
+
+            # Добираем запросы, пришедшие за время ожидания, до заполнения батча
+            while n_records < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+
+                if timeout <= 0:
+                    break
+
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+
+                batch.append(item)
+                n_records += len(item[0])
+
+            self._score_batch(batch, n_records)
+
+    def _score_records(self, records):
+        df = pd.DataFrame.from_records(records).reindex(columns=['id', *self.feature_names])
+        # null из JSON приходит как None, а импьютеры пайплайнов ждут np.nan
+        df = df.where(df.notna(), np.nan)
+        scores = score_frame(clean_chunk(df), self.jsr_pipeline, self.quit_pipeline)
+
+        scores.insert(0, 'id', df['id'].to_numpy())
+
+        return json.loads(scores.to_json(orient='records'))
+
+    def _score_batch(self, batch, n_records):
+        try:
+            rows = self._score_records([record for records, _ in batch for record in records])
+        except Exception:
+            # Ошибку получает только запрос, на котором она воспроизводится,
+            # остальные запросы батча оцениваются по отдельности
+            for records, future in batch:
+                try:
+                    future.set_result(self._score_records(records))
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        with self._lock:
+            self._batch_sizes.append(n_records)
+
+        offset = 0
+
+        for records, future in batch:
+            future.set_result(rows[offset:offset + len(records)])
+            offset += len(records)
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    batcher = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif self.path == '/stats':
+            self._send_json(200, self.batcher.stats())
+        else:
+            self._send_json(404, {'error': f'Неизвестный путь {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/score':
+            self._send_json(404, {'error': f'Неизвестный путь {self.path}'})
+            return
+
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            records = payload if isinstance(payload, list) else [payload]
+            result = self.batcher.score(records)
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        except TimeoutError:
+            self._send_json(503, {'error': 'Превышено время ожидания скоринга'})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': f'Ошибка скоринга: {e}'})
+            return
+
+        self._send_json(200, result if isinstance(payload, list) else result[0])
+
+    def log_message(self, format, *args):
+        # Журнал каждого запроса не пишется: задержки доступны через /stats
+        pass
+
+
+class ScoringServer(ThreadingHTTPServer):
+    # Очередь входящих соединений под одновременные запросы HR-систем
+    request_queue_size = 128
+
+
+def serve(models_dir=MODELS_DIR, host=HOST, port=PORT, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+    jsr_pipeline, quit_pipeline, _ = load_artifacts(models_dir, compiled=True)
+
+    handler = type('Handler', (ScoringHandler,), {
+        'batcher': MicroBatcher(jsr_pipeline, quit_pipeline, max_batch_size, max_wait_ms)
+    })
+
+    server = ScoringServer((host, port), handler)
+    print(f'Сервис скоринга запущен: http://{host}:{port}')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
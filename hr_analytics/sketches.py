@@ -0,0 +1,191 @@
+'''
+Вероятностные скетчи для приближенного профилирования больших таблиц
+
+Каждый скетч обновляется массивом значений целиком (векторно) и сливается с
+другим скетчем того же типа методом merge, поэтому чанки можно обрабатывать
+параллельно и объединять результаты:
+
+- HyperLogLog - кол-во уникальных значений, относительная ошибка 1.04 / sqrt(2 ** p)
+- KLLSketch - квантили, ошибка по рангу ~ 2.3 / k ** 0.97
+- MisraGries - самые частые значения, частота занижена не более чем на error
+'''
+
+import numpy as np
+import pandas as pd
+
+HLL_PRECISION = 12
+KLL_K = 200
+MG_COUNTERS = 64
+
+
+def hash_values(values, categorize=True):
+    # categorize: повторяющиеся строки хэшируются один раз (для уникальных значений не нужно)
+    return pd.util.hash_pandas_object(pd.Series(values), index=False, categorize=categorize).to_numpy()
+
+
+class HyperLogLog:
+    def __init__(self, p=HLL_PRECISION):
+        self.p = p
+        self.registers = np.zeros(2 ** p, dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def update(self, values, distinct=False):
+        '''
+        distinct=True - values уже без повторов (например, словарь категорий)
+        '''
+
+        values = pd.Series(values)
+        hashes = hash_values(values[values.notna()], categorize=not distinct)
+
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        # Позиция первой единицы в оставшихся 64 - p битах; при p >= 11 они точно
+        # представимы во float64, и frexp дает длину в битах
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = (64 - self.p - bit_length + 1).astype(np.uint8)
+
+        np.maximum.at(self.registers, index, rank)
+
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        zeros = np.count_nonzero(self.registers == 0)
+
+        # Поправка для малых кардинальностей (linear counting)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+
+        return estimate
+
+
+class KLLSketch:
+    '''
+    Скетч квантилей KLL: уровни-компакторы, элемент уровня h имеет вес 2 ** h.
+    Переполненный уровень сортируется, и каждый второй элемент (со случайным
+    сдвигом) переходит на уровень выше
+    '''
+
+    def __init__(self, k=KLL_K, random_state=None):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(random_state)
+
+    @property
+    def rank_error(self):
+        return 2.296 / self.k ** 0.9723
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        level = 0
+
+        while level < len(self.levels):
+            items = self.levels[level]
+
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+
+                items = np.sort(items)
+                # При нечетной длине один элемент остается на уровне
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                items = items[:len(items) - len(keep)]
+
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[self.rng.integers(2)::2]])
+                self.levels[level] = keep
+                # Вместимость уровней зависит от их кол-ва, проверка начинается заново
+                level = 0
+            else:
+                level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+        return self
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+
+            self.levels[level] = np.concatenate([self.levels[level], items])
+
+        self._compress()
+
+        return self
+
+    def quantile(self, q):
+        items = np.concatenate(self.levels)
+
+        if not len(items):
+            return np.full(np.shape(q), np.nan)
+
+        weights = np.concatenate([np.full(len(level_items), 2 ** level) for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items)
+        cumweights = np.cumsum(weights[order])
+        position = np.searchsorted(cumweights, np.asarray(q) * cumweights[-1], side='left')
+
+        return items[order][np.minimum(position, len(items) - 1)]
+
+
+class MisraGries:
+    '''
+    Самые частые значения: не более k счетчиков, оценка частоты занижена не
+    более чем на error
+    '''
+
+    def __init__(self, k=MG_COUNTERS):
+        self.k = k
+        self.counts = pd.Series(dtype=np.int64)
+        self.error = 0
+
+    def _reduce(self, counts):
+        # Из всех счетчиков вычитается (k + 1)-я по величине частота
+        if len(counts) <= self.k:
+            return counts, 0
+
+        threshold = np.partition(counts.to_numpy(), -(self.k + 1))[-(self.k + 1)]
+
+        return counts[counts > threshold] - threshold, threshold
+
+    def update(self, values):
+        counts = pd.Series(values).value_counts(dropna=True)
+
+        return self.update_counts(counts[counts > 0])
+
+    def update_counts(self, counts):
+        # Точные частоты чанка - тоже сводка Misra-Gries: она сокращается до k
+        # счетчиков и сливается с текущей
+        counts, error = self._reduce(counts.astype(np.int64, copy=False))
+
+        return self._merge_counts(counts, error)
+
+    def _merge_counts(self, counts, error):
+        counts = self.counts.add(counts, fill_value=0).astype(np.int64)
+        self.counts, threshold = self._reduce(counts)
+        self.error += error + threshold
+
+        return self
+
+    def merge(self, other):
+        return self._merge_counts(other.counts, other.error)
+
+    def top(self, n=None):
+        return self.counts.sort_values(ascending=False).head(n)